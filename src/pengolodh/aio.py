@@ -0,0 +1,207 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable
+import zipfile
+
+from lxml import etree  # type: ignore[import-untyped]
+
+from .config import books_configuration
+from .epub import process_volume
+from .extract import NodeDict, NodeTuple, index_dict, index_tuple
+from .index import item_index
+
+
+# an asyncio API over the library: parsing runs in an executor (the loop's
+# default thread pool unless one is given) with a per-book concurrency limit,
+# and identical requests in flight at the same time share a single result.
+# Work is sent to the executor as (location, item-ref, address) so it can be
+# a process pool too; each thread or process keeps its own parsed state.
+
+def book_location(book_id_or_path: str) -> str | None:
+
+    path = Path(books_configuration().get(book_id_or_path, book_id_or_path))
+
+    if path.is_dir() or zipfile.is_zipfile(path):
+        return str(path)
+    else:
+        return None
+
+
+@lru_cache(maxsize=8)
+def load_volume(location: str) -> tuple[Path | zipfile.Path, dict]:
+
+    path = Path(location)
+    book_path: Path | zipfile.Path
+    if path.is_dir():
+        book_path = path
+    else:
+        book_path = zipfile.Path(zipfile.ZipFile(path))
+
+    return book_path, process_volume(book_path)
+
+
+def load_index(location: str, item_ref: str):
+    _, volume_data = load_volume(location)
+    return item_index(volume_data["manifest"][item_ref]["path"])
+
+
+def volume_summary(location: str) -> dict:
+
+    _, volume_data = load_volume(location)
+
+    return {
+        "metadata": volume_data["metadata"],
+        "manifest": {
+            item_id: {key: value for key, value in item.items() if key != "path"}
+            for item_id, item in volume_data["manifest"].items()
+        },
+        "spine": volume_data["spine"],
+    }
+
+
+def prepare_item(location: str, item_ref: str) -> None:
+    load_index(location, item_ref)
+
+
+def item_text(location: str, item_ref: str, address: str | None) -> str | None:
+
+    index = load_index(location, item_ref)
+    if (idx := index.find(address)) is None:
+        return None
+
+    return index.text[index.offsets[idx]:index.offsets[idx] + index.lengths[idx]]
+
+
+def item_xml(location: str, item_ref: str, address: str | None) -> str | None:
+
+    index = load_index(location, item_ref)
+    if (idx := index.find(address)) is None:
+        return None
+
+    return etree.tostring(index.elements[idx], method="xml", encoding="unicode", with_tail=False)
+
+
+def item_node(location: str, item_ref: str, address: str | None, recurse: bool) -> NodeTuple | NodeDict | None:
+
+    index = load_index(location, item_ref)
+    if (idx := index.find(address)) is None:
+        return None
+
+    if recurse:
+        return index_tuple(index, idx, True)
+    else:
+        return index_dict(index, idx)
+
+
+def item_nodes(location: str, item_ref: str) -> list[dict]:
+
+    index = load_index(location, item_ref)
+
+    return [
+        {
+            "item_ref": item_ref,
+            "address": index.addresses[i],
+            "label": index.labels[i],
+            "depth": index.depths[i],
+            "offset": index.offsets[i],
+            "length": index.lengths[i],
+        }
+        for i in range(len(index))
+    ]
+
+
+class Book:
+
+    def __init__(self, location: str, summary: dict, executor: Executor | None, max_concurrency: int):
+        self.location = location
+        self.metadata = summary["metadata"]
+        self.manifest = summary["manifest"]
+        self.item_refs: list[str] = summary["spine"]["itemrefs"]
+        self.executor = executor
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.pending: dict[tuple, asyncio.Future] = {}
+        # with threads, parsed items are shared so each item is parsed once
+        self.shared = not isinstance(executor, ProcessPoolExecutor)
+
+    @property
+    def title(self) -> str | None:
+        return self.metadata.get("title")
+
+    async def run(self, function: Callable, *args) -> Any:
+
+        key = (function.__name__, *args)
+
+        if (future := self.pending.get(key)) is None:
+
+            async def call() -> Any:
+                try:
+                    async with self.semaphore:
+                        loop = asyncio.get_running_loop()
+                        return await loop.run_in_executor(self.executor, function, self.location, *args)
+                finally:
+                    del self.pending[key]
+
+            future = self.pending[key] = asyncio.ensure_future(call())
+
+        # shielded so one caller being cancelled doesn't cancel the others
+        return await asyncio.shield(future)
+
+    async def prepare(self, item_ref: str) -> None:
+
+        if item_ref not in self.manifest:
+            raise KeyError(item_ref)
+
+        if self.shared:
+            await self.run(prepare_item, item_ref)
+
+    async def text(self, item_ref: str, address: str | None = None) -> str | None:
+        await self.prepare(item_ref)
+        return await self.run(item_text, item_ref, address)
+
+    async def xml(self, item_ref: str, address: str | None = None) -> str | None:
+        await self.prepare(item_ref)
+        return await self.run(item_xml, item_ref, address)
+
+    async def node(self, item_ref: str, address: str | None = None, recurse: bool = False) -> NodeTuple | NodeDict | None:
+        await self.prepare(item_ref)
+        return await self.run(item_node, item_ref, address, recurse)
+
+    async def nodes(self, item_ref: str) -> list[dict]:
+        await self.prepare(item_ref)
+        return await self.run(item_nodes, item_ref)
+
+    async def iter_nodes(self, item_ref: str | None = None) -> AsyncIterator[dict]:
+        # every node of the item (or of every spine item, the next item being
+        # parsed while the current one is consumed)
+
+        item_refs = self.item_refs if item_ref is None else [item_ref]
+
+        upcoming = None
+        try:
+            for i, current_ref in enumerate(item_refs):
+                current = upcoming if upcoming is not None else asyncio.ensure_future(self.nodes(current_ref))
+                upcoming = None
+                if i + 1 < len(item_refs):
+                    upcoming = asyncio.ensure_future(self.nodes(item_refs[i + 1]))
+                for node in await current:
+                    yield node
+        finally:
+            # the consumer stopped early or something failed: don't leave the
+            # prefetch running unobserved
+            if upcoming is not None and not upcoming.done():
+                upcoming.cancel()
+            elif upcoming is not None and not upcoming.cancelled():
+                upcoming.exception()
+
+
+async def open_book(book_id_or_path: str, executor: Executor | None = None, max_concurrency: int = 4) -> Book:
+
+    if (location := book_location(book_id_or_path)) is None:
+        raise ValueError(f"{book_id_or_path} is not a directory or a valid EPUB file")
+
+    loop = asyncio.get_running_loop()
+    summary = await loop.run_in_executor(executor, volume_summary, location)
+
+    return Book(location, summary, executor, max_concurrency)
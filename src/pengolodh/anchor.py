@@ -0,0 +1,135 @@
+from bisect import bisect_right
+from typing import Any, Iterable, Iterator
+
+from .index import ItemIndex, item_index
+
+
+def straddles(index: ItemIndex, enclosing: int, start: int, end: int) -> bool:
+    # whether a child of the enclosing node is only partly covered by the span
+
+    children = index.children[enclosing]
+    offsets = index.offsets
+
+    for position in [start, end]:
+        i = bisect_right(children, position, key=lambda child: offsets[child]) - 1
+        if i >= 0:
+            child = children[i]
+            child_start = index.offsets[child]
+            child_end = child_start + index.lengths[child]
+            if child_start < position < child_end and not (start <= child_start and child_end <= end):
+                return True
+
+    return False
+
+
+def anchor_item(index: ItemIndex, annotations: list[dict]) -> Iterator[dict]:
+    # resolves the annotations of one item in a single sweep: annotations
+    # sorted by start are merged against the nodes in document order while a
+    # stack holds the ancestors of the current position
+
+    offsets = index.offsets
+    lengths = index.lengths
+    parents = index.parents
+    node_count = len(index)
+    text_length = len(index.text)
+
+    for annotation in annotations:
+        if "address" in annotation and "start" not in annotation:
+            if not isinstance(annotation["address"], str):
+                annotation["status"] = "broken"
+                annotation["error"] = "address is not a string"
+            elif (idx := index.find(annotation["address"])) is None:
+                annotation["status"] = "broken"
+                annotation["error"] = "address not found"
+            else:
+                annotation["start"] = offsets[idx]
+                annotation["end"] = offsets[idx] + lengths[idx]
+
+    resolvable = []
+    for annotation in annotations:
+        if "status" in annotation:
+            yield annotation
+        elif "start" not in annotation or "end" not in annotation:
+            annotation["status"] = "broken"
+            annotation["error"] = "missing start/end"
+            yield annotation
+        elif not all(type(annotation[key]) is int for key in ["start", "end"]):
+            annotation["status"] = "broken"
+            annotation["error"] = "start/end are not integers"
+            yield annotation
+        elif not 0 <= annotation["start"] <= annotation["end"] <= text_length:
+            annotation["status"] = "broken"
+            annotation["error"] = "offsets out of range"
+            yield annotation
+        else:
+            resolvable.append(annotation)
+
+    resolvable.sort(key=lambda annotation: (annotation["start"], -annotation["end"]))
+
+    stack: list[int] = []
+    node = 0
+
+    for annotation in resolvable:
+        start = annotation["start"]
+        end = annotation["end"]
+
+        while node < node_count and offsets[node] <= start:
+            while stack and stack[-1] != parents[node]:
+                stack.pop()
+            stack.append(node)
+            node += 1
+
+        # nodes that ended before this start also ended before all later ones
+        while len(stack) > 1 and offsets[stack[-1]] + lengths[stack[-1]] < start:
+            stack.pop()
+
+        enclosing = 0
+        for idx in reversed(stack):
+            if end <= offsets[idx] + lengths[idx]:
+                enclosing = idx
+                break
+
+        # the deepest node whose span covers the start (the stack may still
+        # hold nodes ending exactly there)
+        start_node = enclosing
+        for idx in reversed(stack):
+            if offsets[idx] <= start < offsets[idx] + lengths[idx]:
+                start_node = idx
+                break
+
+        annotation["text"] = index.text[start:end]
+        annotation["enclosing_address"] = index.addresses[enclosing]
+        annotation["enclosing_label"] = index.labels[enclosing]
+        annotation["start_address"] = index.addresses[start_node]
+        if straddles(index, enclosing, start, end):
+            annotation["status"] = "straddling"
+        else:
+            annotation["status"] = "ok"
+
+        yield annotation
+
+
+def anchor_annotations(volume_data: dict, annotations: Iterable[tuple[int, Any]]) -> Iterator[dict]:
+    # yields the (line number, record) annotations enriched with their text
+    # and enclosing addresses, grouped by item (each gets its "line" number).
+    # Records that aren't objects are reported as broken rather than raising
+
+    manifest = volume_data["manifest"]
+
+    items: dict[str, list[dict]] = {}
+    for line, annotation in annotations:
+        if not isinstance(annotation, dict):
+            yield {"line": line, "record": annotation, "status": "broken", "error": "not a JSON object"}
+            continue
+        annotation["line"] = line
+        item_ref = annotation.get("item_ref")
+        items.setdefault(item_ref if isinstance(item_ref, str) else "", []).append(annotation)
+
+    for item_ref, item_annotations in items.items():
+        if item := manifest.get(item_ref):
+            yield from anchor_item(item_index(item["path"]), item_annotations)
+        else:
+            for annotation in item_annotations:
+                annotation["status"] = "broken"
+                annotation["error"] = "item-ref not found"
+                yield annotation
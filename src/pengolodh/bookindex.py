@@ -0,0 +1,194 @@
+import hashlib
+import json
+from pathlib import Path
+import zipfile
+
+from xdg_base_dirs import xdg_cache_home  # type: ignore[import-not-found]
+
+from .index import content_digest, item_index
+
+
+# the book index is the on-disk record, per book, of each spine item's content
+# digest and node table (address, label, offset, length) plus the book-level
+# concordance of where each item starts in the spine. Each item's node table
+# is in its own file so an edit only rewrites the items that changed and the
+# small book file (digests, lengths and the concordance)
+
+INDEX_DIR = xdg_cache_home() / "pengolodh"
+INDEX_VERSION = 2
+
+
+def book_location(book_path: Path | zipfile.Path) -> str:
+
+    if isinstance(book_path, zipfile.Path):
+        return str(Path(str(book_path.root.filename)).resolve())
+    else:
+        return str(Path(book_path).resolve())
+
+
+def file_key(name: str) -> str:
+    return hashlib.blake2b(name.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def location_dir(location: str) -> Path:
+    return INDEX_DIR / file_key(location)
+
+
+def book_index_dir(book_path: Path | zipfile.Path) -> Path:
+    return location_dir(book_location(book_path))
+
+
+def item_nodes_path(location: str, item_ref: str) -> Path:
+    return location_dir(location) / "items" / f"{file_key(item_ref)}.json"
+
+
+def write_json(path: Path, data) -> None:
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # write then rename so a reader never sees a partial file
+    temp_path = path.with_suffix(".tmp")
+    with open(temp_path, "w") as f:
+        json.dump(data, f, ensure_ascii=False)
+    temp_path.replace(path)
+
+
+def load_book_index(book_path: Path | zipfile.Path) -> dict:
+    # the book file only; node tables are read as items are re-indexed
+
+    index_path = book_index_dir(book_path) / "book.json"
+
+    if index_path.exists():
+        with open(index_path) as f:
+            book_index = json.load(f)
+        if book_index.get("version") == INDEX_VERSION:
+            book_index["nodes"] = {}
+            return book_index
+
+    return {
+        "version": INDEX_VERSION,
+        "location": book_location(book_path),
+        "spine": [],
+        "items": {},
+        # node tables re-indexed but not yet saved
+        "nodes": {},
+    }
+
+
+def load_item_nodes(location: str, item_ref: str) -> list:
+
+    nodes_path = item_nodes_path(location, item_ref)
+
+    if nodes_path.exists():
+        with open(nodes_path) as f:
+            return json.load(f)
+
+    return []
+
+
+def save_book_index(book_path: Path | zipfile.Path, book_index: dict) -> None:
+    # writes the node tables re-indexed since the last save, then the book file
+
+    location = book_index["location"]
+
+    for item_ref, nodes in book_index["nodes"].items():
+        write_json(item_nodes_path(location, item_ref), nodes)
+    book_index["nodes"] = {}
+
+    write_json(
+        book_index_dir(book_path) / "book.json",
+        {key: value for key, value in book_index.items() if key != "nodes"},
+    )
+
+
+def node_changes(old_nodes: list, new_nodes: list) -> dict:
+
+    old = {address: (label, offset, length) for address, label, offset, length in old_nodes}
+    new = {address: (label, offset, length) for address, label, offset, length in new_nodes}
+
+    shifted = []
+    added = []
+    removed = []
+
+    for address, (label, offset, length) in new.items():
+        if address not in old or old[address][0] != label:
+            added.append(address)
+        elif old[address][1:] != (offset, length):
+            _, old_offset, old_length = old[address]
+            shifted.append([address, old_offset, offset, old_length, length])
+
+    for address, (label, _, _) in old.items():
+        if address not in new or new[address][0] != label:
+            removed.append(address)
+
+    return {
+        "shifted": shifted,
+        "added": added,
+        "removed": removed,
+    }
+
+
+def refresh_book_index(volume_data: dict, book_index: dict, item_refs: set[str] | None = None) -> dict:
+    # re-indexes only the spine items (of item_refs, if given) whose content
+    # digest has changed, returning the node changes per item and the shift
+    # in start offset of any item that moved
+
+    manifest = volume_data["manifest"]
+    spine_refs = volume_data["spine"]["itemrefs"]
+    items = book_index["items"]
+
+    changes = {}
+
+    for item_ref in spine_refs:
+        if item_refs is not None and item_ref not in item_refs and item_ref in items:
+            continue
+
+        path = manifest[item_ref]["path"]
+        data = path.read_bytes()
+        digest = content_digest(data).hex()
+
+        old_item = items.get(item_ref)
+        if old_item and old_item["digest"] == digest:
+            continue
+
+        index = item_index(path, data)
+        nodes = [
+            [index.addresses[i], index.labels[i], index.offsets[i], index.lengths[i]]
+            for i in range(len(index))
+        ]
+        if old_item:
+            old_nodes = book_index["nodes"].get(item_ref) or load_item_nodes(book_index["location"], item_ref)
+        else:
+            old_nodes = []
+        changes[item_ref] = node_changes(old_nodes, nodes)
+        items[item_ref] = {
+            "href": manifest[item_ref]["href"],
+            "digest": digest,
+            "length": len(index.text),
+        }
+        book_index["nodes"][item_ref] = nodes
+
+    for item_ref in list(items):
+        if item_ref not in spine_refs:
+            del items[item_ref]
+            book_index["nodes"].pop(item_ref, None)
+            item_nodes_path(book_index["location"], item_ref).unlink(missing_ok=True)
+
+    old_starts = {item_ref: start for item_ref, start, _ in book_index["spine"]}
+
+    spine = []
+    shifted = {}
+    start = 0
+    for item_ref in spine_refs:
+        length = items[item_ref]["length"]
+        spine.append([item_ref, start, length])
+        if item_ref in old_starts and old_starts[item_ref] != start:
+            shifted[item_ref] = start - old_starts[item_ref]
+        start += length
+
+    book_index["spine"] = spine
+
+    return {
+        "items": changes,
+        "shifted": shifted,
+    }
@@ -0,0 +1,229 @@
+import os
+from pathlib import Path
+import sqlite3
+from typing import Iterable, Iterator
+import zipfile
+
+from xdg_base_dirs import xdg_data_home  # type: ignore[import-not-found]
+
+from .epub import process_volume
+from .index import item_index
+
+
+CATALOG_PATH = xdg_data_home() / "pengolodh" / "catalog.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    book_id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    title TEXT,
+    ncx_title TEXT,
+    creator TEXT,
+    publisher TEXT,
+    language TEXT,
+    version TEXT,
+    unique_identifier TEXT
+);
+CREATE TABLE IF NOT EXISTS manifest (
+    book_id TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    href TEXT NOT NULL,
+    media_type TEXT NOT NULL,
+    properties TEXT,
+    PRIMARY KEY (book_id, item_id)
+);
+CREATE TABLE IF NOT EXISTS spine (
+    book_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    item_ref TEXT NOT NULL,
+    PRIMARY KEY (book_id, position)
+);
+CREATE TABLE IF NOT EXISTS nodes (
+    book_id TEXT NOT NULL,
+    item_ref TEXT NOT NULL,
+    node INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    label TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    class TEXT,
+    element_id TEXT,
+    depth INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    PRIMARY KEY (book_id, item_ref, node)
+);
+CREATE INDEX IF NOT EXISTS books_publisher ON books (publisher);
+CREATE INDEX IF NOT EXISTS books_creator ON books (creator);
+CREATE INDEX IF NOT EXISTS nodes_tag_class_depth ON nodes (tag, class, depth);
+CREATE INDEX IF NOT EXISTS nodes_label ON nodes (label);
+"""
+
+
+def connect(catalog_path: Path = CATALOG_PATH) -> sqlite3.Connection:
+
+    catalog_path.parent.mkdir(parents=True, exist_ok=True)
+
+    connection = sqlite3.connect(catalog_path)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+
+    return connection
+
+
+def file_location(book_path: Path | zipfile.Path) -> Path:
+
+    if isinstance(book_path, zipfile.Path):
+        return Path(str(book_path.root.filename))
+    else:
+        return Path(book_path)
+
+
+def fingerprint(location: Path) -> str:
+    # size and modification time of the file, or of every file in a directory
+
+    if location.is_dir():
+        size = 0
+        mtime = 0
+        count = 0
+        for dirpath, _, filenames in os.walk(location):
+            for filename in filenames:
+                stat = (Path(dirpath) / filename).stat()
+                size += stat.st_size
+                mtime = max(mtime, stat.st_mtime_ns)
+                count += 1
+        return f"{count}:{size}:{mtime}"
+    else:
+        stat = location.stat()
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def node_rows(book_id: str, item_ref: str, path) -> Iterator[tuple]:
+
+    index = item_index(path)
+
+    for i in range(len(index)):
+        element = index.elements[i]
+        yield (
+            book_id,
+            item_ref,
+            i,
+            index.addresses[i],
+            index.labels[i],
+            element.tag.split("}")[-1],
+            element.get("class"),
+            element.get("id"),
+            index.depths[i],
+            index.offsets[i],
+            index.lengths[i],
+        )
+
+
+def add_book(connection: sqlite3.Connection, book_id: str, book_path: Path | zipfile.Path, book_fingerprint: str) -> None:
+
+    volume_data = process_volume(book_path)
+    metadata = volume_data["metadata"]
+    manifest = volume_data["manifest"]
+    item_refs = volume_data["spine"]["itemrefs"]
+
+    remove_book(connection, book_id)
+
+    connection.execute(
+        "INSERT INTO books VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            book_id,
+            str(file_location(book_path)),
+            book_fingerprint,
+            metadata.get("title"),
+            volume_data["ncx"]["title"],
+            "; ".join(creator for creator in metadata.get("creators", []) if creator),
+            metadata.get("publisher"),
+            metadata.get("language"),
+            volume_data["version"],
+            volume_data["unique_identifier"],
+        ),
+    )
+    connection.executemany(
+        "INSERT INTO manifest VALUES (?, ?, ?, ?, ?)",
+        (
+            (book_id, item_id, item["href"], item["media-type"], item["properties"])
+            for item_id, item in manifest.items()
+        ),
+    )
+    connection.executemany(
+        "INSERT INTO spine VALUES (?, ?, ?)",
+        ((book_id, position, item_ref) for position, item_ref in enumerate(item_refs)),
+    )
+    for item_ref in item_refs:
+        connection.executemany(
+            "INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            node_rows(book_id, item_ref, manifest[item_ref]["path"]),
+        )
+
+
+def remove_book(connection: sqlite3.Connection, book_id: str) -> None:
+    for table in ["books", "manifest", "spine", "nodes"]:
+        connection.execute(f"DELETE FROM {table} WHERE book_id = ?", (book_id,))
+
+
+def build_catalog(connection: sqlite3.Connection, books: Iterable[tuple[str, Path | zipfile.Path]]) -> Iterator[tuple[str, str]]:
+    # (re)loads each book whose fingerprint has changed, one transaction per
+    # book, yielding (book_id, "unchanged" | "updated")
+
+    for book_id, book_path in books:
+        book_fingerprint = fingerprint(file_location(book_path))
+
+        row = connection.execute("SELECT fingerprint FROM books WHERE book_id = ?", (book_id,)).fetchone()
+        if row is not None and row["fingerprint"] == book_fingerprint:
+            yield book_id, "unchanged"
+            continue
+
+        with connection:
+            add_book(connection, book_id, book_path, book_fingerprint)
+
+        yield book_id, "updated"
+
+
+def query_books(connection: sqlite3.Connection, **filters) -> list[sqlite3.Row]:
+    # filters on book columns (title, creator, publisher) as substrings
+
+    conditions = []
+    parameters = []
+    for column in ["title", "creator", "publisher"]:
+        if filters.get(column) is not None:
+            conditions.append(f"{column} LIKE ?")
+            parameters.append(f"%{filters[column]}%")
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    return connection.execute(
+        f"SELECT book_id, title, creator, publisher, language FROM books {where} ORDER BY book_id",
+        parameters,
+    ).fetchall()
+
+
+def query_nodes(connection: sqlite3.Connection, tag: str | None, klass: str | None, depth: int | None) -> list[sqlite3.Row]:
+    # per-book counts of the nodes with the given tag, class and depth
+
+    conditions = []
+    parameters: list = []
+    if tag is not None:
+        conditions.append("nodes.tag = ?")
+        parameters.append(tag)
+    if klass is not None:
+        conditions.append("nodes.class = ?")
+        parameters.append(klass)
+    if depth is not None:
+        conditions.append("nodes.depth = ?")
+        parameters.append(depth)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    return connection.execute(
+        "SELECT nodes.book_id, books.title, COUNT(*) AS count "
+        f"FROM nodes JOIN books ON books.book_id = nodes.book_id {where} "
+        "GROUP BY nodes.book_id ORDER BY nodes.book_id",
+        parameters,
+    ).fetchall()
@@ -0,0 +1,126 @@
+from bisect import bisect_left, bisect_right
+from typing import Iterator
+
+from .index import ItemIndex, item_index
+
+
+def label_matches(label: str, respect: list[str]) -> bool:
+    # "p" matches any p, "div.chapter" only divs with that class
+
+    base = label.split("#")[0]
+    tag = base.split(".")[0]
+
+    return tag in respect or base in respect
+
+
+def element_boundaries(index: ItemIndex, respect: list[str] | None) -> list[int]:
+    # sorted offsets where elements (matching respect, if given) start or end
+
+    boundaries = set()
+
+    for idx in range(len(index)):
+        if respect is None or label_matches(index.labels[idx], respect):
+            boundaries.add(index.offsets[idx])
+            boundaries.add(index.offsets[idx] + index.lengths[idx])
+
+    return sorted(boundaries)
+
+
+def chunk_spans(length: int, size: int, overlap: int, boundaries: list[int]) -> Iterator[tuple[int, int]]:
+    # windows of at most size characters overlapping by about overlap, ending
+    # at the last element boundary that still leaves room to advance and
+    # starting at the first boundary within the overlap
+
+    start = 0
+
+    while start < length:
+        limit = min(start + size, length)
+        end = limit
+        if limit < length:
+            i = bisect_right(boundaries, limit) - 1
+            if i >= 0 and boundaries[i] > start + overlap:
+                end = boundaries[i]
+
+        yield start, end
+
+        if end >= length:
+            break
+
+        next_start = end - overlap
+        j = bisect_left(boundaries, next_start)
+        if j < len(boundaries) and boundaries[j] < end:
+            next_start = boundaries[j]
+        start = next_start
+
+
+def enclosing_node(index: ItemIndex, first: int, second: int) -> int:
+    # lowest common ancestor of two nodes
+
+    while first != second:
+        if index.depths[first] >= index.depths[second]:
+            first = index.parents[first]
+        else:
+            second = index.parents[second]
+
+    return first
+
+
+def spanned_addresses(index: ItemIndex, parent: int, start: int, end: int) -> list[str]:
+    # the children of parent overlapping [start, end)
+
+    children = index.children[parent]
+    offsets = index.offsets
+
+    first = max(bisect_right(children, start, key=lambda child: offsets[child]) - 1, 0)
+    last = bisect_left(children, end, key=lambda child: offsets[child])
+
+    return [
+        index.addresses[child]
+        for child in children[first:last]
+        if index.offsets[child] + index.lengths[child] > start
+    ]
+
+
+def chunk_volume(volume_data: dict, size: int, overlap: int, respect: list[str] | None = None) -> Iterator[dict]:
+    # chunks stream item by item, each carrying its per-item and global
+    # offsets and the addresses it spans. Item boundaries are always chunk
+    # boundaries so only one item's text is held at a time
+
+    if not 0 <= overlap < size:
+        raise ValueError("overlap must be at least 0 and less than size")
+
+    manifest = volume_data["manifest"]
+
+    global_offset = 0
+    chunk_number = 0
+
+    for item_ref in volume_data["spine"]["itemrefs"]:
+        index = item_index(manifest[item_ref]["path"])
+        length = len(index.text)
+
+        segment_starts, segment_nodes = index.segments()
+
+        def owner(position: int) -> int:
+            return segment_nodes[bisect_right(segment_starts, position) - 1]
+
+        for start, end in chunk_spans(length, size, overlap, element_boundaries(index, respect)):
+            start_node = owner(start)
+            end_node = owner(max(start, end - 1))
+            enclosing = enclosing_node(index, start_node, end_node)
+
+            yield {
+                "chunk": chunk_number,
+                "item_ref": item_ref,
+                "start": start,
+                "end": end,
+                "global_start": global_offset + start,
+                "global_end": global_offset + end,
+                "start_address": index.addresses[start_node],
+                "end_address": index.addresses[end_node],
+                "address": index.addresses[enclosing],
+                "addresses": spanned_addresses(index, enclosing, start, end),
+                "text": index.text[start:end],
+            }
+            chunk_number += 1
+
+        global_offset += length
@@ -1,23 +1,46 @@
 from collections import Counter
-from json import dumps
+from json import dumps, loads
 from pathlib import Path
 import re
-from typing import Optional
+import sqlite3
+import time
+from typing import Iterable, Iterator, Optional
 from typing_extensions import Annotated
 import zipfile
 
 from rich.console import Console  # type: ignore[import-not-found]
+from rich.markup import escape  # type: ignore[import-not-found]
 from rich.table import Table  # type: ignore[import-not-found]
+from rich.text import Text  # type: ignore[import-not-found]
 from rich.tree import Tree  # type: ignore[import-not-found]
 
+from lxml import etree  # type: ignore[import-untyped]
 from typer import Typer, Argument  # type: ignore
 
+from .anchor import anchor_annotations
+from .bookindex import load_book_index, refresh_book_index, save_book_index
+from .catalog import CATALOG_PATH, build_catalog, connect, query_books, query_nodes
+from .chunks import chunk_volume
 from .config import books_configuration
+from .diff import diff_volumes
 from .epub import process_volume, process_container, process_opf
-from .extract import extract_node, extract_text, extract_xml
+from .extract import add_hashes, extract_node, extract_text, extract_xml, index_node
+from .index import ItemIndex, item_index, resolve_nav_map
+from .normalize import NormalizedText
+from .output import OUTPUTS, write_json_array, write_plain, write_record, write_records
+from .prefetch import prefetch_indexes
+from .preview import spine_previews
+from .query import select as select_nodes
+from .stats import spine_stats
+from .store import TextStore, write_store
+from .tokens import DEFAULT_PATTERN, load_tokenizer, regex_tokenizer, save_tokens, tokenize_item
+from .units import UNITS, offset_table
+from .watch import watch_changes
 
 
 app = Typer()
+catalog_app = Typer()
+app.add_typer(catalog_app, name="catalog")
 console = Console()
 stderr_console = Console(stderr=True)
 
@@ -30,6 +53,24 @@ def print_error(message: str) -> None:
     stderr_console.print(f"[red]{message}[/red]")
 
 
+def output_mode(output: Optional[str]) -> Optional[str]:
+    # rich is only used for an interactive terminal, otherwise plain (None)
+
+    if output is None:
+        return "rich" if console.is_terminal else None
+    else:
+        return output
+
+
+def check_output(output: Optional[str]) -> bool:
+
+    if output is not None and output not in OUTPUTS:
+        print_error(f"Output '{output}' must be one of {', '.join(OUTPUTS)}.")
+        return False
+
+    return True
+
+
 def get_path(book_id_or_path: str) -> Path | zipfile.Path | None:
 
     books = books_configuration()
@@ -112,19 +153,70 @@ def opf(book_id_or_path: str):
         console.print(table)
 
 
+STATS_COLUMNS = ["Compressed", "Size", "Characters", "Elements", "Max Depth", "Density"]
+
+
 @app.command()
-def spine(book_id_or_path: str):
+def spine(
+    book_id_or_path: str,
+    output: Optional[str] = None,
+    stats: bool = False,
+    preview: Optional[int] = None,
+    workers: int = 4,
+) -> None:
+
+    if not check_output(output):
+        return
 
     if path := get_path(book_id_or_path):
         volume_data = process_volume(path)
         manifest = volume_data["manifest"]
 
+        records: Iterable[dict]
+        if stats:
+            records = spine_stats(path, volume_data, workers)
+        else:
+            records = (
+                {"item_ref": itemref, "href": manifest[itemref]["href"]}
+                for itemref in volume_data["spine"]["itemrefs"]
+            )
+
+        mode = output_mode(output)
+
+        if preview is not None:
+            previews = spine_previews(volume_data, preview, workers=workers)
+            records = (
+                record | {"heading": item["heading"], "preview": item["text"]}
+                for record, item in zip(records, previews)
+            )
+            if mode in ["rich", None]:
+                # one line per item
+                records = (
+                    record | {"heading": record["heading"] or "", "preview": re.sub(r"\s+", " ", record["preview"]).strip()}
+                    for record in records
+                )
+
+        if mode != "rich":
+            if mode == "ndjson":
+                write_records(records)
+            elif mode == "json":
+                write_json_array(records)
+            else:
+                write_plain("".join("\t".join(str(value) for value in record.values()) + "\n" for record in records))
+            return
+
         table = Table(title="Spine")
         table.add_column("Item Ref", style="cyan")
         table.add_column("Path", style="magenta")
+        if stats:
+            for column in STATS_COLUMNS:
+                table.add_column(column, justify="right")
+        if preview is not None:
+            table.add_column("Heading", style="bold")
+            table.add_column("Preview")
 
-        for itemref in volume_data["spine"]["itemrefs"]:
-            table.add_row(itemref, str(manifest[itemref]["href"]))
+        for record in records:
+            table.add_row(*(escape(str(value)) for value in record.values()))
 
         console.print(table)
         console.print(
@@ -141,6 +233,14 @@ def build_nav_tree(node, nav_point) -> None:
     styled_label += f"[cyan]{nav_point['id']}[/cyan] "
     styled_label += f"[bold]{nav_point['label']}[/bold] "
     styled_label += f"[magenta]{nav_point['src']}[/magenta] "
+    if "item_ref" in nav_point:
+        if nav_point["address"] is not None:
+            styled_label += f"[green]{nav_point['item_ref']}[/green]"
+            styled_label += f" [bold]{nav_point['address'] or '(body)'}[/bold]"
+            styled_label += f" [yellow]@{nav_point['offset']}[/yellow]"
+            styled_label += f" [dim](global {nav_point['global_offset']})[/dim]"
+        else:
+            styled_label += "[red]unresolved[/red]"
 
     child_node = node.add(styled_label)
 
@@ -163,29 +263,76 @@ def ncx(book_id_or_path: str):
         console.print(tree)
 
 
+@app.command()
+def toc(
+    book_id_or_path: str,
+    resolved: bool = False,
+) -> None:
+
+    if path := get_path(book_id_or_path):
+        volume_data = process_volume(path)
+
+        if resolved:
+            nav_map = resolve_nav_map(volume_data)
+        else:
+            nav_map = volume_data["ncx"]["navMap"]
+
+        tree = Tree(f"[bold]{volume_data['ncx']['title']}[/bold]")
+        for nav_point in nav_map:
+            build_nav_tree(tree, nav_point)
+
+        console.print(tree)
+
+
 @app.command()
 def extract_map(
     book_id_or_path: str,
     itemref: Annotated[Optional[str], Argument()] = None,
     address: Annotated[Optional[str], Argument()] = None,
-    recurse: bool = False
+    recurse: bool = False,
+    unit: str = "codepoint",
+    hashes: bool = False,
+    output: Optional[str] = None,
 ) -> None:
 
+    if unit not in UNITS:
+        print_error(f"Unit '{unit}' must be one of {', '.join(UNITS)}.")
+        return
+
+    if not check_output(output):
+        return
+
     if path := get_path(book_id_or_path):
         volume_data = process_volume(path)
         manifest = volume_data["manifest"]
+        mode = output_mode(output)
 
         if itemref is None:
-            items = []
-            for item_ref in volume_data["spine"]["itemrefs"]:
-                file_path = manifest[item_ref]["path"]
-                items.append([item_ref, extract_node(file_path, address=None, recurse=recurse, dictionary=not recurse)])
-            console.print(dumps(items, indent=2))
+
+            def items():
+                # the next items are read while the current one is indexed
+                for item_ref, index in prefetch_indexes(volume_data):
+                    node = index_node(index, address=None, recurse=recurse, dictionary=not recurse, unit=unit)
+                    if hashes and node:
+                        node = add_hashes(node, index, None)
+                    yield [item_ref, node]
+
+            if mode == "rich":
+                console.print(dumps(list(items()), indent=2), markup=False, highlight=False)
+            elif mode == "ndjson":
+                write_records(items())
+            else:
+                write_json_array(items())
         else:
             if item := manifest.get(itemref):
                 file_path = item["path"]
-                if node := extract_node(file_path, address, recurse=recurse, dictionary=not recurse):
-                    console.print(node)
+                if node := extract_node(file_path, address, recurse=recurse, dictionary=not recurse, unit=unit):
+                    if hashes:
+                        node = add_hashes(node, item_index(file_path), address)
+                    if mode == "rich":
+                        console.print(node, markup=False, highlight=False)
+                    else:
+                        write_record(node)
                 else:
                     print_error(f"Address '{address}' not found in item reference '{itemref}'.")
             else:
@@ -194,16 +341,123 @@ def extract_map(
 
 
 
-def build_tree(node, data, depth: Optional[int] = None, trim: bool = False) -> None:
+@app.command()
+def convert_offsets(
+    book_id_or_path: str,
+    annotations_path: Path,
+    source_unit: str = "codepoint",
+    target_unit: str = "utf16",
+) -> None:
 
-    address, label, offset, total_length, text, children, tail = data
+    for unit in [source_unit, target_unit]:
+        if unit not in UNITS:
+            print_error(f"Unit '{unit}' must be one of {', '.join(UNITS)}.")
+            return
+
+    if path := get_path(book_id_or_path):
+        volume_data = process_volume(path)
+        manifest = volume_data["manifest"]
+
+        # item-ref -> offset table, built once on first use
+        tables = {}
+
+        with open(annotations_path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = loads(line)
+                item_ref = record["item_ref"]
+                if item_ref not in tables:
+                    if item := manifest.get(item_ref):
+                        tables[item_ref] = offset_table(extract_text(item["path"]) or "")
+                    else:
+                        tables[item_ref] = None
+                if table := tables[item_ref]:
+                    for key in ["start", "end", "offset"]:
+                        if key in record:
+                            record[key] = table.convert(record[key], source_unit, target_unit)
+                else:
+                    record["error"] = "item-ref not found"
+                write_record(record)
+
+
+@app.command()
+def select(
+    book_id_or_path: str,
+    selector: str,
+    itemref: Optional[str] = None,
+    workers: int = 4,
+) -> None:
+
+    if path := get_path(book_id_or_path):
+        volume_data = process_volume(path)
+
+        if itemref is not None and itemref not in volume_data["manifest"]:
+            print_error(f"Item reference '{itemref}' not found in the manifest.")
+            return
+
+        try:
+            for result in select_nodes(volume_data, selector, None if itemref is None else [itemref], workers):
+                write_record(result)
+        except (ValueError, etree.XPathError) as e:
+            print_error(f"Invalid selector '{selector}': {e}")
+
+
+@app.command()
+def diff(
+    old_book_id_or_path: str,
+    new_book_id_or_path: str,
+) -> None:
+
+    if (old_path := get_path(old_book_id_or_path)) and (new_path := get_path(new_book_id_or_path)):
+        statuses: Counter = Counter()
+        for record in diff_volumes(process_volume(old_path), process_volume(new_path)):
+            statuses[record["status"]] += 1
+            write_record(record)
+        print_info(", ".join(f"{count} {status}" for status, count in statuses.items()))
+
+
+@app.command()
+def anchor(
+    book_id_or_path: str,
+    annotations_path: Path,
+) -> None:
+
+    if path := get_path(book_id_or_path):
+        volume_data = process_volume(path)
+
+        # lines that aren't valid JSON, reported after the others
+        invalid = []
+
+        def numbered(f):
+            # numbered before skipping blank lines so they match the file
+            for line, text in enumerate(f, 1):
+                if text.strip():
+                    try:
+                        yield line, loads(text)
+                    except ValueError as e:
+                        invalid.append({"line": line, "status": "broken", "error": f"invalid JSON: {e}"})
+
+        with open(annotations_path) as f:
+            statuses: Counter = Counter()
+            for annotation in anchor_annotations(volume_data, numbered(f)):
+                statuses[annotation["status"]] += 1
+                write_record(annotation)
+            for annotation in invalid:
+                statuses[annotation["status"]] += 1
+                write_record(annotation)
+
+        print_info(", ".join(f"{count} {status}" for status, count in statuses.most_common()))
+
+
+def style_label(address: str, label: str, offset: int, total_length: int) -> str:
 
     if "#" in label:
-        a, d = label.split("#")
+        a, d = label.split("#", 1)
     else:
         a, d = label, ""
     if "." in a:
-        b, c = a.split(".")
+        b, c = a.split(".", 1)
     else:
         b, c = a, ""
     styled_label = f"[bold]{address}[/bold] " if address else ""
@@ -215,23 +469,87 @@ def build_tree(node, data, depth: Optional[int] = None, trim: bool = False) -> N
 
     styled_label += f" [magenta][{offset}:{offset+total_length}][/magenta]"
 
-    child_node = node.add(styled_label, style="not bold")
+    return styled_label
+
+
+def styled_text(text: str | None, trim: bool) -> str | None:
 
     if trim and text:
         text = re.sub(r"\s+", " ", text).strip()
 
-    if text:
-        child_node.add(f"[yellow]{repr(text)}[/yellow]")
+    return f"[yellow]{escape(repr(text))}[/yellow]" if text else None
+
+
+def tree_lines(index: ItemIndex, idx: int, depth: Optional[int], trim: bool, collapse: int, prefix: str = "") -> Iterator[tuple[str, str, str]]:
+    # the lines below a node as (guide, continuation guide, markup), generated
+    # lazily from the item index: nodes beyond the depth are never visited (a
+    # truncated subtree shows only its child count, its span is on the node's
+    # own line) and runs of more than collapse siblings with the same label
+    # are summarized on a single line
+
+    entries: list[tuple] = []
+
+    if text := styled_text(index.elements[idx].text, trim):
+        entries.append(("text", text))
+
+    children = index.children[idx]
+    labels = index.labels
 
     if depth is None or depth > 0:
-        for child in children:
-            build_tree(child_node, child, None if depth is None else depth - 1, trim)
+        i = 0
+        while i < len(children):
+            j = i
+            while j + 1 < len(children) and labels[children[j + 1]] == labels[children[i]]:
+                j += 1
+            if collapse and j - i + 1 > collapse:
+                entries.append(("run", children[i], children[j], j - i + 1))
+                i = j + 1
+                continue
+            entries.append(("node", children[i]))
+            if tail := styled_text(index.elements[children[i]].tail, trim):
+                entries.append(("text", tail))
+            i += 1
+    elif children:
+        entries.append(("truncated", len(children)))
+
+    for k, entry in enumerate(entries):
+        if k == len(entries) - 1:
+            branch, extension = "└── ", "    "
+        else:
+            branch, extension = "├── ", "│   "
+
+        guide = prefix + branch
+        continuation = prefix + extension
+
+        kind = entry[0]
+        if kind == "text":
+            yield guide, continuation, entry[1]
+        elif kind == "node":
+            child = entry[1]
+            yield guide, continuation, style_label(index.addresses[child], labels[child], index.offsets[child], index.lengths[child])
+            yield from tree_lines(index, child, None if depth is None else depth - 1, trim, collapse, prefix + extension)
+        elif kind == "run":
+            _, first, last, count = entry
+            end = index.offsets[last] + index.lengths[last]
+            yield (
+                guide,
+                continuation,
+                f"[dim]{count} ×[/dim] {style_label('', labels[first], index.offsets[first], end - index.offsets[first])}"
+                + f" [bold]{index.addresses[first]}[/bold]…[bold]{index.addresses[last]}[/bold]",
+            )
+        else:
+            yield guide, continuation, f"[dim]… {entry[1]} {'child' if entry[1] == 1 else 'children'}[/dim]"
+
 
-    if trim and tail:
-        tail = re.sub(r"\s+", " ", tail).strip()
+def print_tree_line(guide: str, continuation: str, markup: str) -> None:
+    # wraps the text to the width left after the guides, continuation lines
+    # being indented by the guides so the tree stays readable
 
-    if tail:
-        node.add(f"[yellow]{repr(tail)}[/yellow]")
+    width = max(console.width - len(guide), 20)
+    lines = Text.from_markup(markup).wrap(console, width)
+
+    for i, line in enumerate(lines):
+        console.print(Text(guide if i == 0 else continuation) + line, highlight=False, no_wrap=True, crop=False)
 
 
 def get_file_path(book_id_or_path: str, itemref: str) -> Path | None:
@@ -256,15 +574,31 @@ def tree(
     address: Annotated[Optional[str], Argument()] = None,
     depth: Optional[int] = None,
     trim: bool = False,
+    collapse: int = 0,
+    pager: bool = False,
 ) -> None:
 
     if file_path := get_file_path(book_id_or_path, itemref):
-        tree = Tree(itemref)
-        if node := extract_node(file_path, address, recurse=True, dictionary=False):
-            build_tree(tree, node, depth, trim)
-            console.print(tree)
-        else:
+        index = item_index(file_path)
+        if (idx := index.find(address)) is None:
             print_error(f"Address '{address}' not found in item reference '{itemref}'.")
+            return
+
+        def print_lines() -> None:
+            console.print(escape(itemref), highlight=False)
+            print_tree_line(
+                "└── ",
+                "    ",
+                style_label(index.addresses[idx], index.labels[idx], index.offsets[idx], index.lengths[idx]),
+            )
+            for guide, continuation, markup in tree_lines(index, idx, depth, trim, collapse, "    "):
+                print_tree_line(guide, continuation, markup)
+
+        if pager:
+            with console.pager(styles=True):
+                print_lines()
+        else:
+            print_lines()
 
 
 def get_tags(data):
@@ -282,19 +616,45 @@ def get_tags(data):
 @app.command()
 def tags(
     book_id_or_path: str,
-    itemref: str,
+    itemref: Annotated[Optional[str], Argument()] = None,
     address: Annotated[Optional[str], Argument()] = None,
+    output: Optional[str] = None,
 ) -> None:
 
-    if file_path := get_file_path(book_id_or_path, itemref):
+    if not check_output(output):
+        return
+
+    tags: Counter = Counter()
+
+    if itemref is None:
+        # every spine item, the next items being read while the current one
+        # is indexed
+        if path := get_path(book_id_or_path):
+            for _, index in prefetch_indexes(process_volume(path)):
+                tags.update(label.split("#")[0] for label in index.labels)
+        else:
+            return
+    elif file_path := get_file_path(book_id_or_path, itemref):
         if node := extract_node(file_path, address, recurse=True, dictionary=False):
-            tags = Counter()
             for tag in get_tags(node):
                 tags[tag] += 1
-            for tag, count in tags.most_common():
-                console.print(f"[green]{count:>5}[/green] [bold]{tag}[/bold]")
         else:
             print_error(f"Address '{address}' not found in item reference '{itemref}'.")
+            return
+    else:
+        return
+
+    mode = output_mode(output)
+    records = ({"tag": tag, "count": count} for tag, count in tags.most_common())
+    if mode == "rich":
+        for tag, count in tags.most_common():
+            console.print(f"[green]{count:>5}[/green] [bold]{tag}[/bold]")
+    elif mode == "ndjson":
+        write_records(records)
+    elif mode == "json":
+        write_json_array(records)
+    else:
+        write_plain("".join(f"{count}\t{tag}\n" for tag, count in tags.most_common()))
 
 
 @app.command()
@@ -302,11 +662,21 @@ def text(
     book_id_or_path: str,
     itemref: str,
     address: Annotated[Optional[str], Argument()] = None,
+    output: Optional[str] = None,
 ) -> None:
 
+    if not check_output(output):
+        return
+
     if file_path := get_file_path(book_id_or_path, itemref):
         if text := extract_text(file_path, address):
-            console.print(text)
+            mode = output_mode(output)
+            if mode == "rich":
+                console.print(text, markup=False)
+            elif mode is None:
+                write_plain(text)
+            else:
+                write_record({"item_ref": itemref, "address": address or "", "text": text})
         else:
             print_error(f"Address '{address}' not found in item reference '{itemref}'.")
 
@@ -316,10 +686,345 @@ def xml(
     book_id_or_path: str,
     itemref: str,
     address: Annotated[Optional[str], Argument()] = None,
+    output: Optional[str] = None,
 ) -> None:
 
+    if not check_output(output):
+        return
+
     if file_path := get_file_path(book_id_or_path, itemref):
         if xml := extract_xml(file_path, address):
-            console.print(xml)
+            mode = output_mode(output)
+            if mode == "rich":
+                console.print(xml, markup=False)
+            elif mode is None:
+                write_plain(xml)
+            else:
+                write_record({"item_ref": itemref, "address": address or "", "xml": xml})
         else:
             print_error(f"Address '{address}' not found in item reference '{itemref}'.")
+
+
+@app.command()
+def store(
+    book_id_or_path: str,
+    output_path: Path,
+) -> None:
+
+    if path := get_path(book_id_or_path):
+        volume_data = process_volume(path)
+        manifest = volume_data["manifest"]
+
+        items = []
+        for item_ref in volume_data["spine"]["itemrefs"]:
+            items.append((item_ref, extract_text(manifest[item_ref]["path"]) or ""))
+
+        length = write_store(output_path, items)
+        print_info(f"wrote {length} characters from {len(items)} items to {output_path}")
+
+
+@app.command(name="slice")
+def slice_(
+    store_path: Path,
+    start: int,
+    end: int,
+    itemref: Optional[str] = None,
+) -> None:
+
+    with TextStore(store_path) as text_store:
+        if itemref is None:
+            console.print(text_store.slice(start, end), markup=False, highlight=False)
+        elif itemref in text_store.items:
+            console.print(text_store.item_slice(itemref, start, end), markup=False, highlight=False)
+        else:
+            print_error(f"Item reference '{itemref}' not found in the store.")
+
+
+def print_index_changes(report: dict, elapsed: float, verbose: bool) -> None:
+
+    for item_ref, changes in report["items"].items():
+        console.print(
+            f"[cyan]{item_ref}[/cyan]",
+            f"[yellow]{len(changes['shifted'])}[/yellow] shifted,",
+            f"[green]{len(changes['added'])}[/green] added,",
+            f"[red]{len(changes['removed'])}[/red] removed",
+        )
+        if verbose:
+            for address, old_offset, new_offset, old_length, new_length in changes["shifted"]:
+                console.print(f"  [bold]{address or '(body)'}[/bold] [magenta][{old_offset}:{old_offset + old_length}] -> [{new_offset}:{new_offset + new_length}][/magenta]")
+            for address in changes["added"]:
+                console.print(f"  [bold]{address or '(body)'}[/bold] [green]added[/green]")
+            for address in changes["removed"]:
+                console.print(f"  [bold]{address or '(body)'}[/bold] [red]removed[/red]")
+
+    for item_ref, delta in report["shifted"].items():
+        console.print(f"[cyan]{item_ref}[/cyan] start moved by [yellow]{delta:+}[/yellow]")
+
+    print_info(f"re-indexed {len(report['items'])} items in {elapsed * 1000:.1f}ms")
+
+
+@app.command()
+def watch(
+    book_id_or_path: str,
+    interval: float = 0.5,
+    verbose: bool = False,
+) -> None:
+
+    if path := get_path(book_id_or_path):
+        if not isinstance(path, Path):
+            print_error("Watching needs an unzipped EPUB directory.")
+            return
+
+        started = time.perf_counter()
+        volume_data = process_volume(path)
+        book_index = load_book_index(path)
+        report = refresh_book_index(volume_data, book_index)
+        save_book_index(path, book_index)
+        print_index_changes(report, time.perf_counter() - started, verbose)
+
+        print_info(f"watching {path}")
+
+        # set when the volume (or the whole spine) still needs reloading and
+        # the items still to re-index after a failed update
+        reload_volume = False
+        pending: set[str] = set()
+
+        try:
+            for changed in watch_changes(path, interval):
+                started = time.perf_counter()
+
+                if any(changed_path.suffix in [".opf", ".ncx"] or changed_path.name == "container.xml" for changed_path in changed):
+                    reload_volume = True
+
+                item_refs: Optional[set[str]] = None
+                try:
+                    if reload_volume:
+                        volume_data = process_volume(path)
+                    else:
+                        manifest = volume_data["manifest"]
+                        item_paths = {
+                            Path(manifest[item_ref]["path"]).resolve(): item_ref
+                            for item_ref in volume_data["spine"]["itemrefs"]
+                        }
+                        item_refs = pending | {
+                            item_paths[changed_path.resolve()]
+                            for changed_path in changed
+                            if changed_path.resolve() in item_paths
+                        }
+                        if not item_refs:
+                            continue
+
+                    report = refresh_book_index(volume_data, book_index, item_refs)
+                except (etree.XMLSyntaxError, AssertionError, OSError) as e:
+                    # most likely caught mid-save, or a file removed or renamed
+                    # (as some editors save), so retry on the next change
+                    print_error(f"Could not update the index: {escape(str(e))}")
+                    if item_refs is not None:
+                        pending = item_refs
+                    continue
+
+                reload_volume = False
+                pending = set()
+                save_book_index(path, book_index)
+                print_index_changes(report, time.perf_counter() - started, verbose)
+        except KeyboardInterrupt:
+            pass
+
+
+@app.command()
+def tokens(
+    book_id_or_path: str,
+    output_dir: Path,
+    itemref: Optional[str] = None,
+    pattern: str = DEFAULT_PATTERN,
+    tokenizer: Optional[str] = None,
+) -> None:
+
+    if path := get_path(book_id_or_path):
+        volume_data = process_volume(path)
+        manifest = volume_data["manifest"]
+
+        if itemref is None:
+            item_refs = volume_data["spine"]["itemrefs"]
+        elif itemref in manifest:
+            item_refs = [itemref]
+        else:
+            print_error(f"Item reference '{itemref}' not found in the manifest.")
+            return
+
+        try:
+            tokenize = regex_tokenizer(pattern) if tokenizer is None else load_tokenizer(tokenizer)
+        except (ValueError, ImportError, AttributeError, re.error) as e:
+            print_error(f"Could not load tokenizer: {e}")
+            return
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        for item_ref in item_refs:
+            try:
+                arrays = tokenize_item(item_index(manifest[item_ref]["path"]), tokenize)
+            except ValueError as e:
+                print_error(str(e))
+                return
+            save_tokens(output_dir / f"{item_ref}.npz", arrays)
+            print_info(f"{item_ref}: {len(arrays['starts'])} tokens")
+
+
+@app.command()
+def normalize(
+    book_id_or_path: str,
+    itemref: Annotated[Optional[str], Argument()] = None,
+    address: Annotated[Optional[str], Argument()] = None,
+    output: Optional[str] = None,
+) -> None:
+
+    if not check_output(output):
+        return
+
+    if path := get_path(book_id_or_path):
+        volume_data = process_volume(path)
+        manifest = volume_data["manifest"]
+
+        if itemref is None:
+            item_refs = volume_data["spine"]["itemrefs"]
+        elif itemref in manifest:
+            item_refs = [itemref]
+        else:
+            print_error(f"Item reference '{itemref}' not found in the manifest.")
+            return
+
+        def records():
+            for item_ref in item_refs:
+                index = item_index(manifest[item_ref]["path"])
+                if (idx := index.find(address)) is None:
+                    print_error(f"Address '{address}' not found in item reference '{item_ref}'.")
+                    return
+                offset = index.offsets[idx]
+                normalized = NormalizedText(index.text[offset:offset + index.lengths[idx]], offset)
+                yield {
+                    "item_ref": item_ref,
+                    "address": index.addresses[idx],
+                    "text": normalized.text,
+                    "map": normalized.offset_map(),
+                }
+
+        mode = output_mode(output)
+        if mode == "ndjson":
+            write_records(records())
+        elif mode == "json":
+            write_json_array(records())
+        else:
+            for record in records():
+                if mode == "rich":
+                    console.print(record["text"], markup=False)
+                else:
+                    write_plain(record["text"])
+
+
+@catalog_app.command("build")
+def catalog_build(
+    book_ids_or_paths: Annotated[Optional[list[str]], Argument()] = None,
+    database: Path = CATALOG_PATH,
+) -> None:
+
+    if not book_ids_or_paths:
+        book_ids_or_paths = list(books_configuration())
+        if not book_ids_or_paths:
+            print_error("No books found.")
+            return
+
+    def books():
+        for book_id_or_path in book_ids_or_paths:
+            if path := get_path(book_id_or_path):
+                yield book_id_or_path, path
+
+    connection = connect(database)
+    started = time.perf_counter()
+    statuses: Counter = Counter()
+
+    for book_id, status in build_catalog(connection, books()):
+        statuses[status] += 1
+        if status == "updated":
+            print_info(f"catalogued {book_id}")
+
+    connection.close()
+    print_info(", ".join(f"{count} {status}" for status, count in statuses.items()) + f" in {time.perf_counter() - started:.2f}s")
+
+
+@catalog_app.command("query")
+def catalog_query(
+    label: Optional[str] = None,
+    depth: Optional[int] = None,
+    title: Optional[str] = None,
+    creator: Optional[str] = None,
+    publisher: Optional[str] = None,
+    sql: Optional[str] = None,
+    database: Path = CATALOG_PATH,
+    output: Optional[str] = None,
+) -> None:
+
+    if not check_output(output):
+        return
+
+    if not database.exists():
+        print_error(f"No catalog at {database}; run 'pengolodh catalog build' first.")
+        return
+
+    connection = connect(database)
+
+    if sql is not None:
+        try:
+            rows = connection.execute(sql).fetchall()
+        except sqlite3.Error as e:
+            print_error(f"Query failed: {e}")
+            connection.close()
+            return
+    elif label is not None or depth is not None:
+        tag, _, klass = (label or "").partition(".")
+        rows = query_nodes(connection, tag or None, klass or None, depth)
+    else:
+        rows = query_books(connection, title=title, creator=creator, publisher=publisher)
+
+    connection.close()
+
+    mode = output_mode(output)
+    records = [dict(row) for row in rows]
+
+    if mode == "rich":
+        table = Table(title="Catalog")
+        if records:
+            for column in records[0]:
+                table.add_column(escape(column))
+        for record in records:
+            table.add_row(*["" if value is None else escape(str(value)) for value in record.values()])
+        console.print(table)
+    elif mode == "json":
+        write_json_array(records)
+    else:
+        write_records(records)
+
+
+@app.command()
+def chunks(
+    book_id_or_path: str,
+    size: int = 1000,
+    overlap: int = 100,
+    respect: Optional[str] = None,
+    output: Optional[str] = None,
+) -> None:
+
+    if not check_output(output):
+        return
+
+    if not 0 <= overlap < size:
+        print_error("Overlap must be at least 0 and less than size.")
+        return
+
+    if path := get_path(book_id_or_path):
+        volume_data = process_volume(path)
+        records = chunk_volume(volume_data, size, overlap, None if respect is None else respect.split(","))
+
+        if output_mode(output) == "json":
+            write_json_array(records)
+        else:
+            write_records(records)
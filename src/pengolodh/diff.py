@@ -0,0 +1,117 @@
+from difflib import SequenceMatcher
+from typing import Iterator
+
+from .index import ItemIndex, content_digest, item_index
+
+
+def span(index: ItemIndex, idx: int) -> list[int]:
+    return [index.offsets[idx], index.offsets[idx] + index.lengths[idx]]
+
+
+def children_span(index: ItemIndex, parent: int, start: int, end: int) -> list[int]:
+    # the span covered by children[start:end] of parent (an empty span at the
+    # insertion point if there are none)
+
+    children = index.children[parent]
+
+    if start < end:
+        return [index.offsets[children[start]], span(index, children[end - 1])[1]]
+    elif start < len(children):
+        position = index.offsets[children[start]]
+    else:
+        position = span(index, parent)[1]
+
+    return [position, position]
+
+
+def diff_nodes(old: ItemIndex, old_idx: int, new: ItemIndex, new_idx: int) -> Iterator[dict]:
+    # yields an "equal" remapping for each identical subtree, a "modified"
+    # record for each element descended into (whose own text may have changed)
+    # and a "changed" region for everything else, only descending where
+    # hashes differ
+
+    if old.hashes[old_idx] == new.hashes[new_idx]:
+        yield {
+            "status": "equal",
+            "old_address": old.addresses[old_idx],
+            "new_address": new.addresses[new_idx],
+            "old": span(old, old_idx),
+            "new": span(new, new_idx),
+            "delta": new.offsets[new_idx] - old.offsets[old_idx],
+        }
+        return
+
+    old_children = old.children[old_idx]
+    new_children = new.children[new_idx]
+
+    if old.labels[old_idx] != new.labels[new_idx] or not (old_children and new_children):
+        yield {
+            "status": "changed",
+            "old_address": old.addresses[old_idx],
+            "new_address": new.addresses[new_idx],
+            "old": span(old, old_idx),
+            "new": span(new, new_idx),
+        }
+        return
+
+    # the element itself differs but identical subtrees within it still map
+    yield {
+        "status": "modified",
+        "old_address": old.addresses[old_idx],
+        "new_address": new.addresses[new_idx],
+        "old": span(old, old_idx),
+        "new": span(new, new_idx),
+    }
+
+    matcher = SequenceMatcher(
+        None,
+        [old.hashes[child] for child in old_children],
+        [new.hashes[child] for child in new_children],
+        autojunk=False,
+    )
+
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal" or (tag == "replace" and i2 - i1 == j2 - j1):
+            for old_child, new_child in zip(old_children[i1:i2], new_children[j1:j2]):
+                yield from diff_nodes(old, old_child, new, new_child)
+        else:
+            yield {
+                "status": "changed",
+                "old_address": old.addresses[old_idx],
+                "new_address": new.addresses[new_idx],
+                "old": children_span(old, old_idx, i1, i2),
+                "new": children_span(new, new_idx, j1, j2),
+            }
+
+
+def diff_volumes(old_volume: dict, new_volume: dict) -> Iterator[dict]:
+    # items with identical content are skipped without being parsed
+
+    old_manifest = old_volume["manifest"]
+    new_manifest = new_volume["manifest"]
+    old_refs = old_volume["spine"]["itemrefs"]
+    new_refs = new_volume["spine"]["itemrefs"]
+
+    for item_ref in old_refs:
+        if item_ref not in new_refs:
+            yield {"item_ref": item_ref, "status": "removed"}
+
+    for item_ref in new_refs:
+        if item_ref not in old_refs:
+            yield {"item_ref": item_ref, "status": "added"}
+            continue
+
+        old_path = old_manifest[item_ref]["path"]
+        new_path = new_manifest[item_ref]["path"]
+        old_data = old_path.read_bytes()
+        new_data = new_path.read_bytes()
+
+        if content_digest(old_data) == content_digest(new_data):
+            yield {"item_ref": item_ref, "status": "unchanged"}
+            continue
+
+        old_index = item_index(old_path, old_data)
+        new_index = item_index(new_path, new_data)
+
+        for record in diff_nodes(old_index, 0, new_index, 0):
+            yield {"item_ref": item_ref, **record}
@@ -128,7 +128,7 @@ def process_metadata(metadata_element: etree._Element) -> dict:
                 set(),
             ], child.attrib
             assert len(child) == 0
-            # print(child.text)  # @@@
+            metadata.setdefault("creators", []).append(child.text)
         elif child.tag == dc("contributor"):
             assert set(child.keys()) in [
                 {opf("role")},
@@ -139,7 +139,7 @@ def process_metadata(metadata_element: etree._Element) -> dict:
         elif child.tag == dc("publisher"):
             assert child.attrib == {}
             assert len(child) == 0
-            # print(child.text)  # @@@
+            metadata["publisher"] = child.text
         elif child.tag == dc("rights"):
             assert child.attrib == {}
             assert len(child) == 0
@@ -164,6 +164,7 @@ def process_metadata(metadata_element: etree._Element) -> dict:
             assert child.attrib == {}
             assert len(child) == 0
             assert child.text in ["en", "en-US"]
+            metadata["language"] = child.text
         elif child.tag == dc("identifier"):
             assert set(child.keys()) in [
                 {"id"},
@@ -1,8 +1,11 @@
 from pathlib import Path
-from typing import TypedDict
+from typing import NotRequired, TypedDict
 
 from lxml import etree  # type: ignore[import-untyped]
 
+from .index import ItemIndex, item_index, make_label
+from .units import OffsetTable, offset_table
+
 
 # (address, label, offset, total_length, text, children, tail)
 type NodeTuple = tuple[str, str, int, int, str, list[NodeTuple], str]
@@ -15,116 +18,156 @@ class NodeDict(TypedDict):
     text_length: int
     child_count: int
     tail_length: int
-
-
-def make_label(el: etree._Element) -> str:
-
-    label = el.tag.split("}")[-1]
-    if el.attrib.has_key("class"):
-        label += "." + str(el.attrib["class"])
-    if el.attrib.has_key("id"):
-        label += "#" + str(el.attrib["id"])
-
-    return label
+    hash: NotRequired[str]
 
 
 def get_text(element: etree._Element) -> str:
     return etree.tostring(element, method="text", encoding="unicode", with_tail=False)
 
 
-def element_and_offset(path: Path, address: str | None) -> tuple[etree._Element, int]:
-    root = etree.fromstring(path.read_bytes())
+def element_and_offset(path: Path, address: str | None, unit: str = "codepoint") -> tuple[etree._Element, int]:
+    # the offsets come from the item index (built once per item and cached) so
+    # this is O(depth) rather than serializing every preceding sibling
 
-    # start with the body
-    element = root[1]
+    index = item_index(path)
+    idx, offset = index.locate(address)
 
-    offset = 0
+    if unit != "codepoint":
+        offset = offset_table(index.text).from_codepoint(offset, unit)
 
-    if address:
-        for idx in [int(i) - 1 for i in address.split(".")]:
-            offset += len(element.text or "")
-            for j in range(idx):
-                pre_element = element[j]
-                pre_content = get_text(pre_element)
-                offset += len(pre_content) + len(pre_element.tail or "")
-            child = element[idx]
-            element = child
+    return index.elements[idx], offset
 
-    return element, offset
 
+def extract_node(path: Path, address: str | None, recurse: bool, dictionary: bool, unit: str = "codepoint") -> NodeTuple | NodeDict | None:
+    return index_node(item_index(path), address, recurse, dictionary, unit)
 
-def extract_node(path: Path, address: str | None, recurse: bool, dictionary: bool) -> NodeTuple | NodeDict | None:
 
-    try:
-        element, offset = element_and_offset(path, address)
-    except IndexError:
+def index_node(index: ItemIndex, address: str | None, recurse: bool, dictionary: bool, unit: str = "codepoint") -> NodeTuple | NodeDict | None:
+
+    if (idx := index.find(address)) is None:
         return None
 
+    node: NodeTuple | NodeDict
     if dictionary:
         # note: recurse is ignored for dictionary output
-        return extract_dict(element, offset)[1]
+        node = index_dict(index, idx)
     else:
-        return extract_tuple(element, offset, recurse, address)[1]
+        node = index_tuple(index, idx, recurse)
 
+    if unit != "codepoint":
+        table = offset_table(index.text)
+        if dictionary:
+            node = convert_dict(node, table, unit)  # type: ignore
+        else:
+            node = convert_tuple(node, table, unit)  # type: ignore
 
-def extract_tuple(element: etree._Element, offset: int, recurse: bool, address: str | None) -> tuple[str, NodeTuple]:
-    element_text = get_text(element)
+    return node
 
-    children: list[NodeTuple] = []
 
+def index_tuple(index: ItemIndex, idx: int, recurse: bool) -> NodeTuple:
+
+    element = index.elements[idx]
+
+    children: list[NodeTuple] = []
     if recurse:
-        child_offset = offset + len(element.text or "")
-        for child in element:
-            # skip comments
-            if isinstance(child, etree._Comment):
-                continue
-            child_text, child_data = extract_tuple(child, child_offset, recurse, (address + "." if address else "") + str(len(children) + 1))
-            children.append(child_data)
-            child_offset += len(child_text) + len(child.tail or "")
-
-    node_tuple = (
-        address or "",
-        make_label(element),
-        offset,
-        len(element_text),
+        children = [index_tuple(index, child, recurse) for child in index.children[idx]]
+
+    return (
+        index.addresses[idx],
+        index.labels[idx],
+        index.offsets[idx],
+        index.lengths[idx],
         "" if element.text is None else element.text,
         children,
         "" if element.tail is None else element.tail,
     )
 
-    return (element_text, node_tuple)
 
+def index_dict(index: ItemIndex, idx: int) -> NodeDict:
 
-def extract_dict(element: etree._Element, offset: int) -> tuple[str, NodeDict]:
-    element_text = get_text(element)
+    element = index.elements[idx]
 
-    node_dict = NodeDict({
-        "label": make_label(element),
-        "offset": offset,
-        "total_length": len(element_text),
+    return NodeDict({
+        "label": index.labels[idx],
+        "offset": index.offsets[idx],
+        "total_length": index.lengths[idx],
         "text_length": 0 if element.text is None else len(element.text),
-        "child_count": len(element),
+        "child_count": len(index.children[idx]),
         "tail_length": 0 if element.tail is None else len(element.tail),
     })
 
-    return (element_text, node_dict)
+
+def add_hashes(node: NodeTuple | NodeDict, index: ItemIndex, address: str | None) -> tuple | NodeDict:
+    # adds the hex content hash to an extracted node, as a "hash" key for a
+    # dictionary or a final element of each tuple
+
+    idx = index.find(address)
+    node_hash = "" if idx is None else index.hashes[idx].hex()
+
+    if isinstance(node, dict):
+        return NodeDict(node, hash=node_hash)
+    else:
+        node_address, label, offset, total_length, text, children, tail = node
+        return (
+            node_address,
+            label,
+            offset,
+            total_length,
+            text,
+            [add_hashes(child, index, child[0]) for child in children],
+            tail,
+            node_hash,
+        )
+
+
+def convert_tuple(node: NodeTuple, table: OffsetTable, unit: str) -> NodeTuple:
+
+    address, label, offset, total_length, text, children, tail = node
+
+    offset, total_length = table.convert_span(offset, total_length, unit)
+
+    return (
+        address,
+        label,
+        offset,
+        total_length,
+        text,
+        [convert_tuple(child, table, unit) for child in children],
+        tail,
+    )
+
+
+def convert_dict(node: NodeDict, table: OffsetTable, unit: str) -> NodeDict:
+
+    end = node["offset"] + node["total_length"]
+
+    offset, total_length = table.convert_span(node["offset"], node["total_length"], unit)
+
+    return NodeDict({
+        "label": node["label"],
+        "offset": offset,
+        "total_length": total_length,
+        "text_length": table.convert_span(node["offset"], node["text_length"], unit)[1],
+        "child_count": node["child_count"],
+        "tail_length": table.convert_span(end, node["tail_length"], unit)[1],
+    })
 
 
 def extract_text(filename: Path, address: str | None = None) -> str | None:
 
-    try:
-        element, _ = element_and_offset(filename, address)
-    except IndexError:
+    index = item_index(filename)
+
+    if (idx := index.find(address)) is None:
         return None
 
-    return get_text(element)
+    return index.text[index.offsets[idx]:index.offsets[idx] + index.lengths[idx]]
 
 
 def extract_xml(filename: Path, address: str | None = None) -> str | None:
 
-    try:
-        element, _ = element_and_offset(filename, address)
-    except IndexError:
+    index = item_index(filename)
+
+    if (idx := index.find(address)) is None:
         return None
 
-    return etree.tostring(element, method="xml", encoding="unicode", with_tail=False)
+    return etree.tostring(index.elements[idx], method="xml", encoding="unicode", with_tail=False)
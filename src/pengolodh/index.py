@@ -0,0 +1,297 @@
+from array import array
+from collections import OrderedDict
+import hashlib
+from pathlib import Path
+import posixpath
+from threading import Lock
+import zipfile
+
+from lxml import etree  # type: ignore[import-untyped]
+
+
+
+def make_label(el: etree._Element) -> str:
+
+    label = el.tag.split("}")[-1]
+    if el.attrib.has_key("class"):
+        label += "." + str(el.attrib["class"])
+    if el.attrib.has_key("id"):
+        label += "#" + str(el.attrib["id"])
+
+    return label
+
+
+# an ItemIndex is the node map of a single item (i.e. file) built in one pass
+# over the body: parallel arrays in document order (node 0 being the body
+# itself) plus hash indexes from elements and @id values to nodes
+#
+# each node also keeps the list of its children so navigating to an address
+# is one lookup per level
+#
+# each node also gets a Merkle hash of its label, its text and its children's
+# hashes and tails so identical subtrees can be skipped when diffing
+
+class ItemIndex:
+
+    def __init__(self, root: etree._Element, digest: bytes = b""):
+        self.root = root
+        self.body = root[1]
+        self.digest = digest
+
+        self.elements: list[etree._Element] = []
+        self.addresses: list[str] = []
+        self.labels: list[str] = []
+        self.depths = array("i")
+        self.parents = array("i")
+        self.offsets = array("q")
+        self.lengths = array("q")
+        self.hashes: list[bytes] = []
+        self.children: list[list[int]] = []
+
+        # element -> node index
+        self.positions: dict[etree._Element, int] = {}
+        # @id -> node index
+        self.ids: dict[str, int] = {}
+
+        pieces: list[str] = []
+        self.add_node(self.body, "", 0, -1, pieces, 0)
+        self.text = "".join(pieces)
+
+    def add_node(self, element: etree._Element, address: str, depth: int, parent: int, pieces: list[str], offset: int) -> int:
+        # returns the offset at the end of the element (excluding its tail)
+
+        idx = len(self.elements)
+        label = make_label(element)
+        self.elements.append(element)
+        self.addresses.append(address)
+        self.labels.append(label)
+        self.depths.append(depth)
+        self.parents.append(parent)
+        self.offsets.append(offset)
+        self.lengths.append(0)
+        self.hashes.append(b"")
+        self.children.append([])
+        if parent >= 0:
+            self.children[parent].append(idx)
+
+        node_hash = hashlib.blake2b(label.encode("utf-8"), digest_size=16)
+
+        self.positions[element] = idx
+        if element_id := element.get("id"):
+            self.ids.setdefault(element_id, idx)
+
+        if element.text:
+            pieces.append(element.text)
+            offset += len(element.text)
+        node_hash.update(b"\0" + (element.text or "").encode("utf-8"))
+
+        child_number = 0
+        for child in element:
+            # skip comments and processing instructions but not their tails
+            if isinstance(child.tag, str):
+                child_number += 1
+                offset = self.add_node(
+                    child,
+                    (address + "." if address else "") + str(child_number),
+                    depth + 1,
+                    idx,
+                    pieces,
+                    offset,
+                )
+                node_hash.update(b"\1" + self.hashes[self.children[idx][-1]])
+            if child.tail:
+                pieces.append(child.tail)
+                offset += len(child.tail)
+                node_hash.update(b"\0" + child.tail.encode("utf-8"))
+
+        self.lengths[idx] = offset - self.offsets[idx]
+        self.hashes[idx] = node_hash.digest()
+
+        return offset
+
+    def __len__(self) -> int:
+        return len(self.elements)
+
+    def locate(self, address: str | None) -> tuple[int, int]:
+        # (node index, offset) of the element at the address, raising
+        # IndexError if there isn't one
+
+        idx = 0
+
+        if address:
+            for number in address.split("."):
+                child = int(number) - 1
+                if not 0 <= child < len(self.children[idx]):
+                    raise IndexError(address)
+                idx = self.children[idx][child]
+
+        return idx, self.offsets[idx]
+
+    def find(self, address: str | None) -> int | None:
+        # node index of the element at the address (None if there isn't one)
+
+        try:
+            return self.locate(address)[0]
+        except IndexError:
+            return None
+
+    def segments(self) -> tuple[array, array]:
+        # (start, node) for each run of text in document order owned directly
+        # by a node: its text, then the tail of each of its children. The
+        # deepest node enclosing a position is the node of the last segment
+        # starting at or before it
+
+        starts = array("q")
+        nodes = array("i")
+
+        def add_segments(idx: int) -> None:
+            starts.append(self.offsets[idx])
+            nodes.append(idx)
+            for child in self.children[idx]:
+                add_segments(child)
+                starts.append(self.offsets[child] + self.lengths[child])
+                nodes.append(idx)
+
+        add_segments(0)
+
+        return starts, nodes
+
+    def resolve_id(self, element_id: str) -> tuple[str, int] | None:
+
+        if (idx := self.ids.get(element_id)) is None:
+            return None
+
+        return self.addresses[idx], self.offsets[idx]
+
+
+CACHE_SIZE = 32
+STAMPS_SIZE = 1024
+
+cache: OrderedDict[bytes, ItemIndex] = OrderedDict()
+# item location -> (stamp, digest) of the content last read from it
+stamps: OrderedDict[tuple[str, str], tuple[str, bytes]] = OrderedDict()
+cache_lock = Lock()
+
+
+def content_digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def item_location(path: Path | zipfile.Path) -> tuple[str, str]:
+
+    if isinstance(path, zipfile.Path):
+        return str(path.root.filename), path.at
+    else:
+        return str(path), ""
+
+
+def item_stamp(path: Path | zipfile.Path) -> str:
+    # cheap stand-in for the content: the CRC and size from the zip central
+    # directory, or the modification time and size of a file
+
+    if isinstance(path, zipfile.Path):
+        info = path.root.getinfo(path.at)
+        return f"{info.CRC:08x}:{info.file_size}"
+    else:
+        stat = Path(path).stat()
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def item_index(path: Path | zipfile.Path, data: bytes | None = None) -> ItemIndex:
+    # cached by content so an edited file is never served stale. Without data
+    # the item is only read (and hashed) if its stamp has changed since it
+    # was last read
+
+    location = stamp = None
+
+    if data is None:
+        location = item_location(path)
+        # stamped before reading so a change while reading is seen next time
+        stamp = item_stamp(path)
+
+        with cache_lock:
+            if (stamped := stamps.get(location)) is not None and stamped[0] == stamp:
+                if (index := cache.get(stamped[1])) is not None:
+                    cache.move_to_end(stamped[1])
+                    stamps.move_to_end(location)
+                    return index
+
+        data = path.read_bytes()
+
+    digest = content_digest(data)
+
+    with cache_lock:
+        if location is not None and stamp is not None:
+            stamps[location] = (stamp, digest)
+            stamps.move_to_end(location)
+            while len(stamps) > STAMPS_SIZE:
+                stamps.popitem(last=False)
+
+        if (index := cache.get(digest)) is not None:
+            cache.move_to_end(digest)
+            return index
+
+    index = ItemIndex(etree.fromstring(data), digest)
+
+    with cache_lock:
+        cache[digest] = index
+        while len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+
+    return index
+
+
+def spine_offsets(volume_data: dict) -> dict[str, int]:
+    # item-ref -> global offset of the start of the item in the spine
+
+    manifest = volume_data["manifest"]
+
+    offsets = {}
+    offset = 0
+    for item_ref in volume_data["spine"]["itemrefs"]:
+        offsets[item_ref] = offset
+        offset += len(item_index(manifest[item_ref]["path"]).text)
+
+    return offsets
+
+
+def resolve_nav_map(volume_data: dict) -> list[dict]:
+    # annotates each nav point with the item-ref, address, offset and global
+    # offset its src points to (None where it can't be resolved)
+
+    manifest = volume_data["manifest"]
+    ncx_path = volume_data["ncx"]["path"]
+
+    items = {
+        posixpath.normpath(str(manifest[item_ref]["path"])): item_ref
+        for item_ref in volume_data["spine"]["itemrefs"]
+    }
+
+    global_offsets = spine_offsets(volume_data)
+
+    def resolve(nav_point: dict) -> None:
+
+        href, _, fragment = nav_point["src"].partition("#")
+        item_ref = items.get(posixpath.normpath(str(ncx_path / href)))
+
+        nav_point["item_ref"] = item_ref
+        nav_point["address"] = None
+        nav_point["offset"] = None
+        nav_point["global_offset"] = None
+
+        if item_ref is not None:
+            if fragment:
+                resolved = item_index(manifest[item_ref]["path"]).resolve_id(fragment)
+            else:
+                resolved = ("", 0)
+            if resolved is not None:
+                nav_point["address"], nav_point["offset"] = resolved
+                nav_point["global_offset"] = global_offsets[item_ref] + resolved[1]
+
+        for child in nav_point["children"]:
+            resolve(child)
+
+    for nav_point in volume_data["ncx"]["navMap"]:
+        resolve(nav_point)
+
+    return volume_data["ncx"]["navMap"]
@@ -0,0 +1,86 @@
+from array import array
+from bisect import bisect_right
+import re
+
+
+WHITESPACE = re.compile(r"\s+")
+
+
+# whitespace-normalized text (each run of whitespace collapsed to a single
+# space and the ends stripped) with a run-length map back to the original:
+# each segment is a stretch of the normalized text that is an unchanged copy
+# of the original, so both directions are a binary search over segment starts
+
+class NormalizedText:
+
+    def __init__(self, text: str, base: int = 0):
+        # base is added to original offsets (e.g. the offset of an element)
+
+        self.normalized_starts = array("q")
+        self.original_starts = array("q")
+        self.lengths = array("q")
+
+        pieces: list[str] = []
+        normalized = 0
+        position = 0
+
+        def add_segment(start: int, end: int) -> None:
+            nonlocal normalized
+            if end > start:
+                self.normalized_starts.append(normalized)
+                self.original_starts.append(base + start)
+                self.lengths.append(end - start)
+                normalized += end - start
+
+        for match in WHITESPACE.finditer(text):
+            start, end = match.span()
+            if start == 0:
+                # leading whitespace is dropped
+                position = end
+            elif end == len(text):
+                # as is trailing whitespace
+                add_segment(position, start)
+                pieces.append(text[position:start])
+                position = end
+            elif end - start > 1 or text[start] != " ":
+                # keep the first whitespace character as a space and drop the rest
+                add_segment(position, start + 1)
+                pieces.append(text[position:start] + " ")
+                position = end
+
+        add_segment(position, len(text))
+        pieces.append(text[position:])
+
+        self.text = "".join(pieces)
+
+    def to_original(self, offset: int) -> int:
+
+        i = bisect_right(self.normalized_starts, offset) - 1
+        if i < 0:
+            return self.original_starts[0] if self.original_starts else 0
+
+        return self.original_starts[i] + min(offset - self.normalized_starts[i], self.lengths[i])
+
+    def to_normalized(self, offset: int) -> int:
+        # offsets inside dropped whitespace map to the position after it
+
+        i = bisect_right(self.original_starts, offset) - 1
+        if i < 0:
+            return 0
+
+        return self.normalized_starts[i] + min(offset - self.original_starts[i], self.lengths[i])
+
+    def span_to_original(self, start: int, end: int) -> tuple[int, int]:
+
+        if end <= start:
+            position = self.to_original(start)
+            return position, position
+
+        return self.to_original(start), self.to_original(end - 1) + 1
+
+    def offset_map(self) -> dict:
+        return {
+            "normalized": list(self.normalized_starts),
+            "original": list(self.original_starts),
+            "length": list(self.lengths),
+        }
@@ -0,0 +1,55 @@
+import json
+import sys
+from typing import Any, Iterable
+
+try:
+    import orjson  # type: ignore[import-not-found]
+except ImportError:
+    orjson = None
+
+
+# bulk output goes straight to stdout as it's produced rather than through
+# rich, which would scan the whole string for markup and highlighting
+
+OUTPUTS = ["rich", "json", "ndjson"]
+
+
+def encode(record: Any) -> bytes:
+
+    if orjson is not None:
+        return orjson.dumps(record)
+    else:
+        return json.dumps(record, ensure_ascii=False).encode("utf-8")
+
+
+def write_record(record: Any) -> None:
+    sys.stdout.buffer.write(encode(record) + b"\n")
+
+
+def write_records(records: Iterable[Any]) -> None:
+
+    for record in records:
+        sys.stdout.buffer.write(encode(record) + b"\n")
+
+    sys.stdout.flush()
+
+
+def write_json_array(records: Iterable[Any]) -> None:
+    # a single JSON array, still written one record at a time
+
+    out = sys.stdout.buffer
+    separator = b"[\n"
+
+    for record in records:
+        out.write(separator + encode(record))
+        separator = b",\n"
+
+    out.write(b"[]\n" if separator == b"[\n" else b"\n]\n")
+    sys.stdout.flush()
+
+
+def write_plain(text: str) -> None:
+    sys.stdout.write(text)
+    if not text.endswith("\n"):
+        sys.stdout.write("\n")
+    sys.stdout.flush()
@@ -0,0 +1,87 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+import threading
+from typing import Callable, Iterable, Iterator, TypeVar
+import zipfile
+
+from .index import ItemIndex, item_index
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+# a bounded producer/consumer pipeline: a thread pool works ahead on upcoming
+# items while the caller consumes the current one, but never more than
+# max_in_flight items ahead, so at most that many results (e.g. decompressed
+# members) are held in memory at once. Decompression and parsing release the
+# GIL so the threads overlap without results having to be pickled
+
+def bounded_map(function: Callable[[T], R], items: Iterable[T], workers: int = 4, max_in_flight: int = 8) -> Iterator[R]:
+    # like executor.map, in order, but only submitting as results are consumed
+
+    items = iter(items)
+    pending: deque[Future] = deque()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for item in items:
+                pending.append(executor.submit(function, item))
+                if len(pending) >= max_in_flight:
+                    break
+
+            while pending:
+                result = pending.popleft().result()
+                for item in items:
+                    pending.append(executor.submit(function, item))
+                    break
+                yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def read_members(paths: Iterable[Path | zipfile.Path], workers: int = 4, max_in_flight: int = 8) -> Iterator[tuple[Path | zipfile.Path, bytes]]:
+    # (path, bytes) of each item in order, zip members being read and
+    # decompressed ahead through a ZipFile handle per thread (a shared handle
+    # would serialize them on its lock)
+
+    handles = threading.local()
+    opened: list[zipfile.ZipFile] = []
+    opened_lock = threading.Lock()
+
+    def read(path: Path | zipfile.Path) -> tuple[Path | zipfile.Path, bytes]:
+
+        if not isinstance(path, zipfile.Path):
+            return path, path.read_bytes()
+
+        file_name = str(path.root.filename)
+        zip_files = handles.__dict__.setdefault("zip_files", {})
+        if (zip_file := zip_files.get(file_name)) is None:
+            zip_file = zip_files[file_name] = zipfile.ZipFile(file_name)
+            with opened_lock:
+                opened.append(zip_file)
+
+        return path, zip_file.read(path.at)
+
+    try:
+        yield from bounded_map(read, paths, workers, max_in_flight)
+    finally:
+        for zip_file in opened:
+            zip_file.close()
+
+
+def prefetch_indexes(volume_data: dict, item_refs: list[str] | None = None, workers: int = 4, max_in_flight: int = 8) -> Iterator[tuple[str, ItemIndex]]:
+    # (item-ref, index) of each spine item (or of item_refs) in order, the
+    # next items being read while the current one is parsed and indexed
+
+    manifest = volume_data["manifest"]
+
+    if item_refs is None:
+        item_refs = volume_data["spine"]["itemrefs"]
+
+    members = read_members((manifest[item_ref]["path"] for item_ref in item_refs), workers, max_in_flight)
+
+    for item_ref, (path, data) in zip(item_refs, members):
+        yield item_ref, item_index(path, data)
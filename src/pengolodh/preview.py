@@ -0,0 +1,93 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import re
+from typing import Iterator
+import zipfile
+
+from lxml import etree  # type: ignore[import-untyped]
+
+
+HEADINGS = {"h1", "h2", "h3"}
+
+
+# the start of an item's body text and its first heading from an incremental
+# parse of the (streamed, for a zip) item that stops once enough text has been
+# seen, so the cost depends on the preview length rather than the item size.
+# The text is the same as the item index's (comment text skipped, tails kept)
+
+def item_preview(path: Path | zipfile.Path, length: int) -> dict:
+    # text is the first length characters of the body; heading is the text of
+    # the first h1-h3 starting within them (or None); complete is whether the
+    # whole body was read
+
+    pieces: list[str] = []
+    characters = 0
+    heading = None
+    open_heading = None
+    pending: tuple[etree._Element, str] | None = None
+    depth = -2
+    in_body = False
+    complete = False
+
+    with path.open("rb") as source:
+        events = etree.iterparse(source, events=("start", "end", "comment", "pi"))
+        for event, element in events:
+            # a text (after a start) or tail (after an end or a comment) is
+            # only complete once the parser has moved on to the next event, so
+            # the attribute is read then rather than when its event fired
+            if pending is not None and characters < length:
+                element_pending, attribute = pending
+                if piece := getattr(element_pending, attribute):
+                    pieces.append(piece)
+                    characters += len(piece)
+            pending = None
+
+            if event == "start":
+                depth += 1
+                if depth == 0 and not in_body:
+                    in_body = etree.QName(element).localname == "body"
+                if in_body and depth >= 0:
+                    pending = (element, "text")
+                    if heading is None and open_heading is None and etree.QName(element).localname in HEADINGS:
+                        open_heading = element
+            elif event == "end":
+                if in_body and depth >= 0:
+                    if element is open_heading:
+                        heading = re.sub(r"\s+", " ", "".join(element.itertext())).strip()
+                        open_heading = None
+                    if depth == 0:
+                        complete = True
+                        break
+                    pending = (element, "tail")
+                    if open_heading is None:
+                        element.clear(keep_tail=True)
+                depth -= 1
+            elif in_body and depth >= 0:
+                pending = (element, "tail")
+
+            if characters >= length and open_heading is None:
+                break
+
+    return {
+        "text": "".join(pieces)[:length],
+        "heading": heading,
+        "complete": complete,
+    }
+
+
+def spine_previews(volume_data: dict, length: int, item_refs: list[str] | None = None, workers: int = 4) -> Iterator[dict]:
+    # previews of the spine items (or of item_refs) in spine order, computed
+    # in parallel
+
+    manifest = volume_data["manifest"]
+
+    if item_refs is None:
+        item_refs = volume_data["spine"]["itemrefs"]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        previews = executor.map(lambda item_ref: item_preview(manifest[item_ref]["path"], length), item_refs)
+        for item_ref, preview in zip(item_refs, previews):
+            yield {
+                "item_ref": item_ref,
+                "href": manifest[item_ref]["href"],
+            } | preview
@@ -0,0 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from typing import Iterator
+
+from lxml import etree  # type: ignore[import-untyped]
+
+from .index import item_index
+
+
+XHTML = "http://www.w3.org/1999/xhtml"
+
+NAMESPACES = {"h": XHTML, "xhtml": XHTML}
+
+
+def selector_to_xpath(selector: str) -> str:
+    # XPath is passed through, anything else is treated as CSS
+
+    if selector.startswith(("/", "./", "(")):
+        return selector
+
+    try:
+        from cssselect import GenericTranslator, SelectorError  # type: ignore[import-not-found]
+    except ImportError:
+        raise ValueError("CSS selectors need the cssselect package (or use XPath with the h: prefix)")
+
+    class XHTMLTranslator(GenericTranslator):
+
+        def xpath_element(self, selector):
+            # unprefixed element names are in the XHTML namespace
+            if selector.element and selector.namespace is None:
+                selector.namespace = "h"
+            return super().xpath_element(selector)
+
+    try:
+        return XHTMLTranslator().css_to_xpath(selector)
+    except SelectorError as e:
+        raise ValueError(e)
+
+
+def select_item(item_ref: str, path, xpath: str, compiled: threading.local) -> tuple[int, list[dict]]:
+
+    # XPath evaluators aren't shared between threads so each compiles its own
+    if not hasattr(compiled, "selector"):
+        compiled.selector = etree.XPath(xpath, namespaces=NAMESPACES)
+
+    index = item_index(path)
+
+    results = []
+    for match in compiled.selector(index.body):
+        # only elements in the body have an address
+        if (idx := index.positions.get(match)) is None:
+            continue
+        results.append({
+            "item_ref": item_ref,
+            "address": index.addresses[idx],
+            "label": index.labels[idx],
+            "offset": index.offsets[idx],
+            "length": index.lengths[idx],
+        })
+
+    return len(index.text), results
+
+
+def select(volume_data: dict, selector: str, item_refs: list[str] | None = None, workers: int = 4) -> Iterator[dict]:
+    # yields matches in spine order, items being evaluated in parallel
+    # (global offsets are only known when the whole spine is selected from)
+
+    manifest = volume_data["manifest"]
+
+    xpath = selector_to_xpath(selector)
+    # fail early on a bad selector rather than in every worker
+    etree.XPath(xpath, namespaces=NAMESPACES)
+
+    whole_spine = item_refs is None
+    if item_refs is None:
+        item_refs = volume_data["spine"]["itemrefs"]
+
+    compiled = threading.local()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(
+            lambda item_ref: select_item(item_ref, manifest[item_ref]["path"], xpath, compiled),
+            item_refs,
+        )
+        global_offset = 0
+        for item_length, item_results in results:
+            for result in item_results:
+                if whole_spine:
+                    result["global_offset"] = global_offset + result["offset"]
+                yield result
+            global_offset += item_length
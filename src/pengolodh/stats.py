@@ -0,0 +1,152 @@
+from concurrent.futures import ProcessPoolExecutor
+import json
+from pathlib import Path
+from typing import Iterator
+import zipfile
+
+from lxml import etree  # type: ignore[import-untyped]
+
+from .bookindex import book_index_dir, write_json
+from .index import item_stamp
+
+
+# per spine item statistics from a streaming scan of the body (the same text
+# and elements as the item index, without building it): sizes come from the
+# zip central directory (or the file system for an unpacked book) and the
+# central directory's CRC and size (or the file's mtime and size) are the key
+# under which the stats are cached, in a file of their own next to the book
+# index so reading them doesn't mean reading any node tables
+
+STATS_VERSION = 1
+
+
+def item_source(path: Path | zipfile.Path) -> tuple[str, str | None]:
+    # (file, member) to open the item from another process
+
+    if isinstance(path, zipfile.Path):
+        return str(path.root.filename), path.at
+    else:
+        return str(path), None
+
+
+def item_entry(path: Path | zipfile.Path) -> dict:
+    # sizes and cache key without reading the item
+
+    if isinstance(path, zipfile.Path):
+        info = path.root.getinfo(path.at)
+        compressed_size, size = info.compress_size, info.file_size
+    else:
+        compressed_size = size = Path(path).stat().st_size
+
+    return {
+        "key": item_stamp(path),
+        "compressed_size": compressed_size,
+        "size": size,
+    }
+
+
+def load_stats(book_path: Path | zipfile.Path) -> dict:
+
+    stats_path = book_index_dir(book_path) / "stats.json"
+
+    if stats_path.exists():
+        with open(stats_path) as f:
+            stats = json.load(f)
+        if stats.get("version") == STATS_VERSION:
+            return stats["items"]
+
+    return {}
+
+
+def save_stats(book_path: Path | zipfile.Path, items: dict) -> None:
+    write_json(book_index_dir(book_path) / "stats.json", {"version": STATS_VERSION, "items": items})
+
+
+def scan_item(file_name: str, member: str | None) -> dict:
+    # character count, element count and maximum depth of the body (depth 0),
+    # counting text and tails like the item index: comments and processing
+    # instructions aren't elements and their text isn't counted, their tails
+    # are. Elements are cleared as they end so memory stays flat
+
+    characters = 0
+    elements = 0
+    max_depth = 0
+    depth = -2
+    in_body = False
+
+    if member is None:
+        source = open(file_name, "rb")
+    else:
+        source = zipfile.ZipFile(file_name).open(member)
+
+    with source:
+        for event, element in etree.iterparse(source, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if depth == 0 and not in_body:
+                    in_body = etree.QName(element).localname == "body"
+                if in_body and depth >= 0:
+                    elements += 1
+                    max_depth = max(max_depth, depth)
+            else:
+                if in_body and depth >= 0:
+                    characters += len(element.text or "")
+                    characters += sum(len(child.tail or "") for child in element)
+                    element.clear(keep_tail=True)
+                    if depth == 0:
+                        break
+                depth -= 1
+
+    return {
+        "characters": characters,
+        "elements": elements,
+        "max_depth": max_depth,
+    }
+
+
+def spine_stats(book_path: Path | zipfile.Path, volume_data: dict, workers: int = 4) -> Iterator[dict]:
+    # stats for every spine item in spine order, scanning (in a process pool)
+    # only the items whose key differs from the cached one
+
+    manifest = volume_data["manifest"]
+    item_refs = volume_data["spine"]["itemrefs"]
+
+    cached = load_stats(book_path)
+
+    entries = {item_ref: item_entry(manifest[item_ref]["path"]) for item_ref in item_refs}
+
+    stale = [
+        item_ref for item_ref in dict.fromkeys(item_refs)
+        if cached.get(item_ref, {}).get("key") != entries[item_ref]["key"]
+    ]
+
+    if stale:
+        sources = [item_source(manifest[item_ref]["path"]) for item_ref in stale]
+        if len(stale) > 1 and workers > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(stale))) as executor:
+                scans = list(executor.map(scan_item, *zip(*sources)))
+        else:
+            scans = [scan_item(*source) for source in sources]
+
+        for item_ref, scan in zip(stale, scans):
+            cached[item_ref] = entries[item_ref] | scan
+
+        for item_ref in list(cached):
+            if item_ref not in entries:
+                del cached[item_ref]
+
+        save_stats(book_path, cached)
+
+    for item_ref in item_refs:
+        item = cached[item_ref]
+        yield {
+            "item_ref": item_ref,
+            "href": manifest[item_ref]["href"],
+            "compressed_size": item["compressed_size"],
+            "size": item["size"],
+            "characters": item["characters"],
+            "elements": item["elements"],
+            "max_depth": item["max_depth"],
+            # characters of text per byte of markup
+            "density": round(item["characters"] / item["size"], 4) if item["size"] else 0.0,
+        }
@@ -0,0 +1,128 @@
+import mmap
+from pathlib import Path
+import struct
+from typing import Iterable
+
+
+# A text store is the concatenated spine text of a book in a fixed-width
+# encoding so that any codepoint slice can be read without decoding the
+# prefix.
+#
+# header: magic, version, width, (reserved), item_count, length, data_offset
+# item table: item_count * (start, end, ref_length) followed by the item-ref
+# data: length * width bytes, aligned to width
+
+MAGIC = b"PENGOLDH"
+VERSION = 1
+
+HEADER = struct.Struct("<8sBBHIQQ")
+ITEM = struct.Struct("<QQH")
+
+ENCODINGS = {
+    1: "latin-1",
+    2: "utf-16-le",
+    4: "utf-32-le",
+}
+
+
+def store_width(text: str) -> int:
+
+    if not text:
+        return 1
+
+    max_codepoint = ord(max(text))
+
+    if max_codepoint < 0x100:
+        return 1
+    elif max_codepoint < 0x10000:
+        # UTF-16 is only fixed-width (UCS-2) without surrogate pairs
+        return 2
+    else:
+        return 4
+
+
+def write_store(output_path: Path, items: Iterable[tuple[str, str]]) -> int:
+
+    items = list(items)
+
+    width = max([store_width(text) for _, text in items], default=1)
+    encoding = ENCODINGS[width]
+
+    table = bytearray()
+    start = 0
+    for item_ref, text in items:
+        ref = item_ref.encode("utf-8")
+        table += ITEM.pack(start, start + len(text), len(ref)) + ref
+        start += len(text)
+
+    data_offset = HEADER.size + len(table)
+    padding = -data_offset % width
+    data_offset += padding
+
+    with open(output_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, width, 0, len(items), start, data_offset))
+        f.write(table)
+        f.write(b"\0" * padding)
+        for _, text in items:
+            f.write(text.encode(encoding))
+
+    return start
+
+
+class TextStore:
+
+    def __init__(self, path: Path):
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, width, _, item_count, length, data_offset = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a pengolodh text store")
+
+        self.width = width
+        self.encoding = ENCODINGS[width]
+        self.length = length
+        self.data_offset = data_offset
+
+        # item-ref -> (start, end)
+        self.items: dict[str, tuple[int, int]] = {}
+        position = HEADER.size
+        for _ in range(item_count):
+            start, end, ref_length = ITEM.unpack_from(self.mm, position)
+            position += ITEM.size
+            item_ref = self.mm[position:position + ref_length].decode("utf-8")
+            position += ref_length
+            self.items[item_ref] = (start, end)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __enter__(self) -> "TextStore":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if not self.mm.closed:
+            self.mm.close()
+        self.file.close()
+
+    def slice(self, start: int, end: int) -> str:
+
+        start = max(0, min(start, self.length))
+        end = max(start, min(end, self.length))
+
+        return self.mm[
+            self.data_offset + start * self.width:self.data_offset + end * self.width
+        ].decode(self.encoding)
+
+    def item_slice(self, item_ref: str, start: int | None = None, end: int | None = None) -> str:
+
+        item_start, item_end = self.items[item_ref]
+
+        start = item_start if start is None else item_start + start
+        end = item_end if end is None else min(item_start + end, item_end)
+
+        return self.slice(start, end)
@@ -0,0 +1,71 @@
+from importlib import import_module
+from itertools import chain
+from pathlib import Path
+import re
+from typing import Callable, Iterable
+
+from .index import ItemIndex
+
+
+DEFAULT_PATTERN = r"\w+|[^\w\s]"
+
+type Tokenizer = Callable[[str], Iterable[tuple[int, int]]]
+
+
+def regex_tokenizer(pattern: str = DEFAULT_PATTERN) -> Tokenizer:
+
+    regex = re.compile(pattern)
+
+    def tokenize(text: str) -> Iterable[tuple[int, int]]:
+        return (match.span() for match in regex.finditer(text))
+
+    return tokenize
+
+
+def load_tokenizer(name: str) -> Tokenizer:
+    # "module:callable" where the callable takes a text and returns (start,
+    # end) codepoint spans
+
+    module_name, _, attribute = name.partition(":")
+    if not attribute:
+        raise ValueError(f"Tokenizer '{name}' should be of the form module:callable")
+
+    return getattr(import_module(module_name), attribute)
+
+
+def tokenize_item(index: ItemIndex, tokenizer: Tokenizer) -> dict:
+    # token start/end offsets and the node table index of the deepest node
+    # enclosing each token's start, as NumPy arrays
+
+    try:
+        import numpy as np  # type: ignore[import-not-found]
+    except ImportError:
+        raise ValueError("Token arrays need numpy (the tokens extra)")
+
+    spans = np.fromiter(chain.from_iterable(tokenizer(index.text)), dtype=np.int64).reshape(-1, 2)
+    starts = spans[:, 0]
+    ends = spans[:, 1]
+
+    segment_starts, segment_nodes = index.segments()
+    segment_starts_array = np.frombuffer(segment_starts, dtype=np.int64)
+    segment_nodes_array = np.frombuffer(segment_nodes, dtype=np.int32)
+
+    nodes = segment_nodes_array[np.searchsorted(segment_starts_array, starts, side="right") - 1]
+
+    return {
+        "starts": starts,
+        "ends": ends,
+        "nodes": nodes,
+        "node_addresses": np.array(index.addresses, dtype=str),
+        "node_labels": np.array(index.labels, dtype=str),
+        "node_offsets": np.frombuffer(index.offsets, dtype=np.int64),
+        "node_lengths": np.frombuffer(index.lengths, dtype=np.int64),
+        "node_depths": np.frombuffer(index.depths, dtype=np.int32),
+    }
+
+
+def save_tokens(output_path: Path, arrays: dict) -> None:
+
+    import numpy as np  # type: ignore[import-not-found]
+
+    np.savez_compressed(output_path, **arrays)
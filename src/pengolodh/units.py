@@ -0,0 +1,97 @@
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+
+
+UNITS = ["codepoint", "utf16", "utf8"]
+
+
+def unit_length(text: str, unit: str) -> int:
+
+    if unit == "codepoint":
+        return len(text)
+    elif unit == "utf16":
+        return len(text.encode("utf-16-le")) // 2
+    elif unit == "utf8":
+        return len(text.encode("utf-8"))
+    else:
+        raise ValueError(unit)
+
+
+# sparse checkpoints of the cumulative UTF-16 and UTF-8 lengths of a text
+# every `interval` codepoints, so an offset converts with one lookup plus a
+# scan of at most `interval` characters
+
+class OffsetTable:
+
+    def __init__(self, text: str, interval: int = 64):
+        self.text = text
+        self.interval = interval
+
+        # unit -> checkpoint array (None if the unit is the same as codepoints)
+        self.checkpoints: dict[str, array | None] = {"codepoint": None}
+
+        ascii = text.isascii()
+        bmp = ascii or ord(max(text)) < 0x10000
+
+        for unit, same in [("utf16", bmp), ("utf8", ascii)]:
+            if same:
+                self.checkpoints[unit] = None
+            else:
+                checkpoints = array("q", [0])
+                total = 0
+                for start in range(0, len(text), interval):
+                    total += unit_length(text[start:start + interval], unit)
+                    checkpoints.append(total)
+                self.checkpoints[unit] = checkpoints
+
+    def from_codepoint(self, offset: int, unit: str) -> int:
+
+        checkpoints = self.checkpoints[unit]
+        if checkpoints is None:
+            return offset
+
+        offset = max(0, min(offset, len(self.text)))
+        i = offset // self.interval
+        start = i * self.interval
+
+        return checkpoints[i] + unit_length(self.text[start:offset], unit)
+
+    def to_codepoint(self, offset: int, unit: str) -> int:
+        # an offset inside a multi-unit character resolves to that character
+
+        checkpoints = self.checkpoints[unit]
+        if checkpoints is None:
+            return offset
+
+        offset = max(0, min(offset, checkpoints[-1]))
+        i = bisect_right(checkpoints, offset) - 1
+        codepoint = i * self.interval
+        total = checkpoints[i]
+
+        while codepoint < len(self.text):
+            total += unit_length(self.text[codepoint], unit)
+            if total > offset:
+                break
+            codepoint += 1
+
+        return min(codepoint, len(self.text))
+
+    def convert(self, offset: int, source_unit: str, target_unit: str) -> int:
+
+        if source_unit == target_unit:
+            return offset
+
+        return self.from_codepoint(self.to_codepoint(offset, source_unit), target_unit)
+
+    def convert_span(self, offset: int, length: int, unit: str) -> tuple[int, int]:
+        # codepoint (offset, length) -> (offset, length) in unit
+
+        start = self.from_codepoint(offset, unit)
+
+        return start, self.from_codepoint(offset + length, unit) - start
+
+
+@lru_cache(maxsize=32)
+def offset_table(text: str) -> OffsetTable:
+    return OffsetTable(text)
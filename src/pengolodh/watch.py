@@ -0,0 +1,49 @@
+import os
+from pathlib import Path
+import time
+from typing import Iterator
+
+
+def snapshot(directory: Path) -> dict[Path, tuple[int, int]]:
+
+    files = {}
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files[path] = (stat.st_mtime_ns, stat.st_size)
+
+    return files
+
+
+def poll_changes(directory: Path, interval: float = 0.5) -> Iterator[set[Path]]:
+
+    before = snapshot(directory)
+
+    while True:
+        time.sleep(interval)
+        after = snapshot(directory)
+        changed = {
+            path for path in before.keys() | after.keys()
+            if before.get(path) != after.get(path)
+        }
+        if changed:
+            yield changed
+        before = after
+
+
+def watch_changes(directory: Path, interval: float = 0.5) -> Iterator[set[Path]]:
+    # yields sets of changed files, using inotify (via watchfiles) if
+    # available and polling mtimes otherwise
+
+    try:
+        from watchfiles import watch  # type: ignore[import-not-found]
+    except ImportError:
+        yield from poll_changes(directory, interval)
+        return
+
+    for changes in watch(directory):
+        yield {Path(path) for _, path in changes}
@@ -2,13 +2,17 @@ from pathlib import Path
 import re
 import zipfile
 
+from rich.markup import escape
 from textual.app import App, ComposeResult
 from textual.message import Message
 from textual.widgets import ListView, ListItem, Label, Tree, Static
 
 from pengolodh.config import books_configuration
 from pengolodh.epub import process_volume
-from pengolodh.extract import extract_node, extract_xml
+from pengolodh.extract import extract_xml, index_tuple
+from pengolodh.index import item_index
+from pengolodh.prefetch import bounded_map
+from pengolodh.preview import item_preview
 
 
 def get_path(book_id_or_path: str) -> Path | zipfile.Path | None:
@@ -32,6 +36,14 @@ def get_path(book_id_or_path: str) -> Path | zipfile.Path | None:
     return book_path
 
 
+def book_title(book_id: str) -> tuple[str, str | None]:
+
+    if path := get_path(book_id):
+        return book_id, process_volume(path)["metadata"]["title"]
+    else:
+        return book_id, None
+
+
 class BookSelected(Message):
     def __init__(self, book_id: str, title: str):
         self.book_id = book_id
@@ -44,9 +56,9 @@ class BookList(ListView):
 
     def on_mount(self):
         if books := books_configuration():
-            for book_id, path in books.items():
-                if path := get_path(book_id):
-                    title = process_volume(path)["metadata"]["title"]
+            # books are opened and their OPF and NCX parsed in a thread pool
+            for book_id, title in bounded_map(book_title, books):
+                if title is not None:
                     item = ListItem(Label(f"[cyan]{book_id}[/cyan] [bold]{title}[/bold]"))
                     item.book_id = book_id
                     item.title = title
@@ -89,6 +101,13 @@ class ItemSelected(Message):
         super().__init__()
 
 
+class ItemHighlighted(Message):
+    def __init__(self, book_path, item_path: str):
+        self.book_path = book_path
+        self.item_path = item_path
+        super().__init__()
+
+
 class NCX(Tree[str]):
     BORDER_TITLE = "Navigation Map"
 
@@ -105,6 +124,11 @@ class NCX(Tree[str]):
         self.post_message(
             ItemSelected(event.node.data["book_path"], event.node.data["item_path"]))
 
+    def on_tree_node_highlighted(self, event: Tree.NodeHighlighted[str]) -> None:
+        if event.node.data:
+            self.post_message(
+                ItemHighlighted(event.node.data["book_path"], event.node.data["item_path"]))
+
 
 def build_tree(node, data):
 
@@ -155,10 +179,14 @@ class XMLTree(Tree[str]):
 
     def load_item(self, book_path, item_path) -> None:
         self.clear()
-        path = process_volume(book_path)["ncx_path"].parent / item_path.split("#")[0]
+        href, _, fragment = item_path.partition("#")
+        path = process_volume(book_path)["ncx_path"].parent / href
         self.root.label = str()
         self.root.expand()
-        node = extract_node(path, None, recurse=True, dictionary=False)
+        index = item_index(path)
+        # go straight to the subtree for a fragment, otherwise the whole body
+        idx = index.ids.get(fragment, 0) if fragment else 0
+        node = index_tuple(index, idx, True)
         build_tree(self.root, node)
 
     def on_tree_node_selected(self, event: Tree.NodeSelected[str]) -> None:
@@ -169,6 +197,17 @@ class XMLTree(Tree[str]):
 class Content(Static):
     BORDER_TITLE = "Content"
 
+    def load_preview(self, book_path, item_path):
+        # only the start of the item is parsed
+        path = process_volume(book_path)["ncx_path"].parent / item_path.split("#")[0]
+        preview = item_preview(path, 500)
+        content = escape(re.sub(r"\s+", " ", preview["text"]).strip())
+        if preview["heading"]:
+            content = f"[bold]{escape(preview['heading'])}[/bold]\n\n{content}"
+        if not preview["complete"]:
+            content += "[dim]…[/dim]"
+        self.update(content)
+
     def load_content(self, book_path, item_path, address):
         path = process_volume(book_path)["ncx_path"].parent / item_path.split("#")[0]
         content = extract_xml(path, address)
@@ -206,6 +245,10 @@ class PengolodhApp(App):
         ncx_widget.load_book(message.book_id, message.title)
         self.book_path = get_path(message.book_id)
 
+    def on_item_highlighted(self, message: ItemHighlighted) -> None:
+        content_widget = self.query_one(Content)
+        content_widget.load_preview(message.book_path, message.item_path)
+
     def on_item_selected(self, message: ItemSelected) -> None:
         xmltree_widget = self.query_one(XMLTree)
         xmltree_widget.load_item(message.book_path, message.item_path)